@@ -35,3 +35,5 @@ tools throughout a django application.
 
 
 __version__ = (2, 0, 2, "final", 0)
+
+default_app_config = 'linaro_django_pagination.apps.PaginationConfig'
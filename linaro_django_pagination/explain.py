@@ -0,0 +1,240 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Query plans of paginated querysets.
+
+Explains the count of a queryset and its page slices at increasing offsets,
+to see how the cost of a page grows with its depth before production does,
+and suggests the index serving both the filter and the ordering.
+
+Plans are read with ``EXPLAIN QUERY PLAN`` on SQLite, ``EXPLAIN (FORMAT
+JSON)`` on PostgreSQL and ``EXPLAIN`` on MySQL. Only PostgreSQL estimates a
+cost, the other databases only tell whether tables are scanned and rows
+sorted.
+"""
+
+import hashlib
+import json
+
+from django.db import connections
+
+from linaro_django_pagination.paginator import _ordering_keys
+
+
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN (FORMAT JSON) ',
+    'mysql': 'EXPLAIN ',
+}
+
+EQUALITY_LOOKUPS = ('exact', 'in', 'isnull')
+
+
+class Plan(object):
+    """
+    The plan of a query: its lines, estimated cost when the database gives
+    one, and whether it scans a whole table or sorts rows without an index.
+    """
+
+    def __init__(self, lines, cost=None, full_scan=False, sort=False):
+        self.lines = lines
+        self.cost = cost
+        self.full_scan = full_scan
+        self.sort = sort
+
+    @property
+    def problems(self):
+        problems = []
+        if self.full_scan:
+            problems.append("full scan")
+        if self.sort:
+            problems.append("sort without index")
+        return problems
+
+
+def _sqlite_plan(cursor):
+    lines = [row[-1] for row in cursor.fetchall()]
+    full_scan = any(line.startswith('SCAN ') and ' USING ' not in line for line in lines)
+    sort = any('TEMP B-TREE FOR ORDER BY' in line for line in lines)
+    return Plan(lines, full_scan=full_scan, sort=sort)
+
+
+def _postgresql_plan(cursor):
+    result = cursor.fetchone()[0]
+    if not isinstance(result, list):
+        result = json.loads(result)
+    lines = []
+    node_types = set()
+
+    def walk(node, depth):
+        node_types.add(node['Node Type'])
+        lines.append("%s%s%s (cost=%s..%s rows=%s)" % (
+            "  " * depth, node['Node Type'], " on %s" % node['Relation Name'] if 'Relation Name' in node else "",
+            node['Startup Cost'], node['Total Cost'], node['Plan Rows']))
+        for child in node.get('Plans', ()):
+            walk(child, depth + 1)
+    plan = result[0]['Plan']
+    walk(plan, 0)
+    return Plan(lines, cost=plan['Total Cost'], full_scan='Seq Scan' in node_types, sort='Sort' in node_types)
+
+
+def _mysql_plan(cursor):
+    columns = [column[0].lower() for column in cursor.description]
+    lines = []
+    full_scan = sort = False
+    for row in cursor.fetchall():
+        row = dict(zip(columns, row))
+        lines.append("%s type=%s key=%s rows=%s %s" % (
+            row.get('table'), row.get('type'), row.get('key'), row.get('rows'), row.get('extra') or ''))
+        full_scan = full_scan or row.get('type') == 'ALL'
+        sort = sort or 'filesort' in (row.get('extra') or '')
+    return Plan(lines, full_scan=full_scan, sort=sort)
+
+
+PLAN_READERS = {
+    'sqlite': _sqlite_plan,
+    'postgresql': _postgresql_plan,
+    'mysql': _mysql_plan,
+}
+
+
+def explain_sql(sql, params, using):
+    """
+    Returns the Plan of the query sql with params on the database using.
+    """
+    connection = connections[using]
+    if connection.vendor not in EXPLAIN_PREFIXES:
+        raise ValueError("Cannot explain queries on %s" % connection.vendor)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(EXPLAIN_PREFIXES[connection.vendor] + sql, params)
+        return PLAN_READERS[connection.vendor](cursor)
+    finally:
+        cursor.close()
+
+
+def explain(queryset):
+    """
+    Returns the Plan of the query of queryset.
+    """
+    sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    return explain_sql(sql, params, queryset.db)
+
+
+def explain_count(queryset):
+    """
+    Returns the Plan of counting queryset.
+    """
+    sql, params = queryset.order_by().values('pk').query.get_compiler(using=queryset.db).as_sql()
+    return explain_sql("SELECT COUNT(*) FROM (%s) subquery" % sql, params, queryset.db)
+
+
+def explain_pages(queryset, per_page, offsets):
+    """
+    Returns the Plans of the pages of queryset starting at each offset, as
+    (offset, Plan) pairs.
+    """
+    return [(offset, explain(queryset[offset:offset + per_page])) for offset in offsets]
+
+
+def _equality_columns(query):
+    # Only the conditions every row has to meet can narrow an index scan:
+    # those joined with AND and not negated, on the table of the model
+    table = query.get_meta().db_table
+    columns = []
+    nodes = [query.where]
+    while nodes:
+        node = nodes.pop(0)
+        if node.negated or (node.connector != 'AND' and len(node.children) > 1):
+            continue
+        for child in node.children:
+            if hasattr(child, 'children'):
+                nodes.append(child)
+                continue
+            target = getattr(getattr(child, 'lhs', None), 'target', None)
+            if (target is not None and getattr(child.lhs, 'alias', None) == table and
+                    child.lookup_name in EQUALITY_LOOKUPS and target.column not in columns):
+                columns.append(target.column)
+    return columns
+
+
+def suggest_index(queryset):
+    """
+    Returns the columns of the index serving queryset best, as (column,
+    descending) pairs: the columns it compares for equality followed by those
+    of its ordering.
+
+    Orderings on anything else than fields of the model are left out, the
+    index then only serves the filter.
+    """
+    opts = queryset.model._meta
+    columns = [(column, False) for column in _equality_columns(queryset.query)]
+    try:
+        keys = _ordering_keys(queryset)
+    except ValueError:
+        keys = []
+    by_attname = dict((field.attname, field.column) for field in opts.concrete_fields)
+    for attname, descending in keys:
+        column = by_attname[attname]
+        if column not in [name for name, _ in columns]:
+            columns.append((column, descending))
+    return columns
+
+
+def covering_index(queryset, columns):
+    """
+    Returns the name of an existing index of the table of queryset starting
+    with columns, regardless of their direction, or None.
+    """
+    connection = connections[queryset.db]
+    names = [column for column, _ in columns]
+    cursor = connection.cursor()
+    try:
+        constraints = connection.introspection.get_constraints(cursor, queryset.model._meta.db_table)
+    finally:
+        cursor.close()
+    for name, constraint in sorted(constraints.items()):
+        if (constraint['index'] or constraint['primary_key'] or constraint['unique']) and \
+                constraint['columns'][:len(names)] == names:
+            return name
+    return None
+
+
+def index_sql(queryset, columns):
+    """
+    Returns the CREATE INDEX statement of the index on columns of the table
+    of queryset.
+    """
+    quote_name = connections[queryset.db].ops.quote_name
+    table = queryset.model._meta.db_table
+    digest = hashlib.md5(repr(columns).encode('utf-8')).hexdigest()[:8]
+    return "CREATE INDEX %s ON %s (%s);" % (
+        quote_name("%s_%s_pagination" % (table, digest)), quote_name(table),
+        ", ".join(quote_name(column) + (" DESC" if descending else "") for column, descending in columns))
@@ -0,0 +1,119 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import warnings
+
+from django.db import connections
+
+from linaro_django_pagination import settings
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised when a pagination tag runs more queries than its budget allows.
+    """
+
+
+class QueryBudgetWarning(RuntimeWarning):
+    """
+    Warns that a pagination tag ran more queries than its budget allows.
+    """
+
+
+class QueryCounter(object):
+    """
+    Context manager counting the queries run on all database connections
+    inside its block.
+
+    Queries are recorded the same way ``DEBUG`` records them, which costs a
+    little, so counting only happens when enabled. Otherwise ``count`` is
+    None and ``sql`` is empty.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.queries = None
+
+    def __enter__(self):
+        if self.enabled:
+            self._connections = list(connections.all())
+            self._debug_cursors = [connection.force_debug_cursor for connection in self._connections]
+            self._starts = [len(connection.queries_log) for connection in self._connections]
+            for connection in self._connections:
+                connection.force_debug_cursor = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.enabled:
+            self.queries = []
+            for connection, debug_cursor, start in zip(self._connections, self._debug_cursors, self._starts):
+                connection.force_debug_cursor = debug_cursor
+                self.queries.extend(list(connection.queries_log)[start:])
+
+    @property
+    def count(self):
+        """
+        The number of queries run inside the block.
+        """
+        if self.queries is None:
+            return None
+        return len(self.queries)
+
+    @property
+    def sql(self):
+        """
+        The SQL of the queries run inside the block.
+        """
+        return [query['sql'] for query in self.queries or ()]
+
+
+def get_query_budget(tag):
+    """
+    Returns the number of queries the given pagination tag may run, or None
+    when it is not limited.
+    """
+    budget = settings.QUERY_BUDGET
+    if isinstance(budget, dict):
+        return budget.get(tag)
+    return budget
+
+
+def check_query_budget(tag, page_suffix, queries):
+    """
+    Warns, or raises QueryBudgetExceeded with PAGINATION_QUERY_BUDGET_RAISE,
+    when the queries counted for a pagination tag exceed its budget.
+    """
+    budget = get_query_budget(tag)
+    if budget is None or queries.count <= budget:
+        return
+    message = "{%% %s %%} of page%s ran %d queries, the budget is %d:\n%s" % (
+        tag, page_suffix, queries.count, budget, "\n".join(queries.sql))
+    if settings.QUERY_BUDGET_RAISE:
+        raise QueryBudgetExceeded(message)
+    warnings.warn(message, QueryBudgetWarning)
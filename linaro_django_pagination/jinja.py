@@ -0,0 +1,176 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Pagination for Jinja2 templates.
+
+Adding ``PaginationExtension`` to the extensions of a Jinja2 environment
+provides the ``autopaginate()`` and ``paginate()`` globals, the counterparts
+of the template tags, using the same paginators and settings::
+
+    {% set entries = autopaginate(entries, 20) %}
+    {% for entry in entries %}...{% endfor %}
+    {{ paginate(entries) }}
+
+The control is rendered from the ``pagination/pagination.html`` template of
+the environment, by default the one in the ``jinja2`` directory of this
+application.
+"""
+
+from timeit import default_timer
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import InvalidPage
+from django.http import Http404
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+try:
+    from jinja2 import pass_context
+except ImportError:     # Jinja2 < 3.0
+    from jinja2 import contextfunction as pass_context
+
+try:
+    from django.utils.translation import ugettext as gettext
+except ImportError:     # Django >= 4.0
+    from django.utils.translation import gettext
+
+from linaro_django_pagination import settings, signals
+from linaro_django_pagination.instrumentation import QueryCounter, check_query_budget, get_query_budget
+from linaro_django_pagination.templatetags.pagination_tags import (
+    choose_paginator_class,
+    get_paginator,
+    get_rendered_control,
+    paginate as get_pagination_context,
+    paginate_list,
+    set_rendered_control,
+)
+
+
+class Pagination(object):
+    """
+    The page of a list paginated by ``autopaginate()``, iterating over the
+    objects of the page.
+    """
+
+    def __init__(self, paginator, page_obj, page_suffix='', invalid_page=False):
+        self.paginator = paginator
+        self.page_obj = page_obj
+        self.page_suffix = page_suffix
+        self.invalid_page = invalid_page
+
+    @property
+    def object_list(self):
+        return self.page_obj.object_list if self.page_obj is not None else []
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+@pass_context
+def autopaginate(context, object_list, per_page=None, orphans=None, using=None, page_suffix=''):
+    """
+    Returns the page of object_list the request asks for, as a Pagination.
+
+    Lists with several paginations on a page need a distinct page_suffix
+    each, such as ``'_entries'``. Lists the view already paginated, see
+    ``PaginationMixin``, are returned as they are.
+    """
+    page_obj = context.get('page_obj')
+    if page_obj is not None and page_obj.object_list is object_list:
+        return Pagination(context.get('paginator'), page_obj, context.get('page_suffix', ''))
+    request = context.get('request')
+    if request is None:
+        raise ImproperlyConfigured("autopaginate() needs the request in the context of the template.")
+    if per_page is None:
+        per_page = settings.DEFAULT_PAGINATION
+    if orphans is None:
+        orphans = settings.DEFAULT_ORPHANS
+    paginator = get_paginator(choose_paginator_class(request, using), object_list, per_page, orphans)
+    try:
+        paginator, page_obj = paginate_list(paginator, request, page_suffix)
+    except InvalidPage:
+        if settings.INVALID_PAGE_RAISES_404:
+            raise Http404('Invalid page requested.')
+        return Pagination(paginator, None, page_suffix, invalid_page=True)
+    return Pagination(paginator, page_obj, page_suffix)
+
+
+@pass_context
+def paginate(context, pagination=None, template=None, window=settings.DEFAULT_WINDOW,
+             margin=settings.DEFAULT_MARGIN):
+    """
+    Renders the pagination control of pagination, by default of the list the
+    view paginated, with template or ``pagination/pagination.html``.
+    """
+    if pagination is None:
+        pagination = Pagination(context.get('paginator'), context.get('page_obj'), context.get('page_suffix', ''))
+    if pagination.page_obj is None:
+        return Markup('')
+    key = ('jinja2', pagination.page_suffix, template)
+    content = get_rendered_control(context.get('request'), key, pagination.page_obj)
+    if content is not None:
+        return content
+    instrumented = signals.pagination_rendered.has_listeners() or get_query_budget('paginate') is not None
+    with QueryCounter(instrumented) as queries:
+        started = default_timer()
+        new_context = get_pagination_context({
+            'paginator': pagination.paginator,
+            'page_obj': pagination.page_obj,
+            'page_suffix': pagination.page_suffix,
+            'request': context.get('request'),
+        }, window, margin)
+        new_context.update(request=context.get('request'), previous_label=gettext("previous"),
+                           next_label=gettext("next"))
+        template_list = ['pagination/pagination.html']
+        if template:
+            template_list.insert(0, template)
+        content = Markup(context.environment.select_template(template_list).render(new_context))
+        elapsed = default_timer() - started
+    set_rendered_control(context.get('request'), key, pagination.page_obj, content)
+    if instrumented:
+        check_query_budget('paginate', pagination.page_suffix, queries)
+        signals.pagination_rendered.send(
+            sender=Pagination, request=context.get('request'), page_suffix=pagination.page_suffix,
+            template=template, render_time=elapsed, queries=queries.count)
+    return content
+
+
+class PaginationExtension(Extension):
+    """
+    Jinja2 extension providing the ``autopaginate()`` and ``paginate()``
+    globals.
+    """
+
+    def __init__(self, environment):
+        super(PaginationExtension, self).__init__(environment)
+        environment.globals.update(autopaginate=autopaginate, paginate=paginate)
@@ -0,0 +1,95 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from django.core.management.base import BaseCommand, CommandError
+
+try:
+    from django.utils.six import string_types
+except ImportError:     # Django >= 3.0
+    string_types = (str,)
+
+from linaro_django_pagination import settings
+from linaro_django_pagination.explain import covering_index, explain_count, explain_pages, index_sql, suggest_index
+from linaro_django_pagination.warmer import is_url_entry, load_queryset
+
+
+class Command(BaseCommand):
+    help = ("Explains the count and the pages at increasing offsets of querysets, those of "
+            "PAGINATION_WARM_UP by default, and suggests the index serving their filter and ordering.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('querysets', nargs='*',
+                            help="Dotted paths to querysets or to functions returning them.")
+        parser.add_argument('--per-page', type=int, default=None,
+                            help="Number of objects per page, PAGINATION_DEFAULT_PAGINATION by default.")
+        parser.add_argument('--offsets', default='0,1000,10000,100000',
+                            help="Comma separated offsets of the pages to explain.")
+
+    def handle(self, *args, **options):
+        entries = options['querysets'] or [entry for entry in settings.WARM_UP if not is_url_entry(entry)]
+        if not entries:
+            raise CommandError("No querysets given and none in PAGINATION_WARM_UP.")
+        try:
+            offsets = [int(offset) for offset in options['offsets'].split(',')]
+        except ValueError:
+            raise CommandError("Invalid offsets %r" % options['offsets'])
+        per_page = options['per_page'] or settings.DEFAULT_PAGINATION
+        for entry in entries:
+            self.stdout.write(entry if isinstance(entry, string_types) else repr(entry))
+            try:
+                self.write_report(load_queryset(entry), per_page, offsets)
+            except Exception as error:
+                self.stdout.write("  cannot be explained: %s" % error)
+
+    def write_report(self, queryset, per_page, offsets):
+        self.write_plan("count", explain_count(queryset))
+        first_cost = None
+        for offset, plan in explain_pages(queryset, per_page, offsets):
+            growth = ""
+            if plan.cost is not None:
+                if first_cost is None:
+                    first_cost = plan.cost
+                elif first_cost:
+                    growth = " x%.1f" % (plan.cost / first_cost)
+            self.write_plan("offset %d%s" % (offset, growth), plan)
+        columns = suggest_index(queryset)
+        if not columns:
+            self.stdout.write("  index: none, the queryset is neither filtered nor ordered on its fields")
+            return
+        name = covering_index(queryset, columns)
+        if name is not None:
+            self.stdout.write("  index: served by %s" % name)
+        else:
+            self.stdout.write("  index: %s" % index_sql(queryset, columns))
+
+    def write_plan(self, label, plan):
+        cost = "-" if plan.cost is None else "%.1f" % plan.cost
+        self.stdout.write("  %-20s cost=%-10s %s" % (label, cost, ", ".join(plan.problems)))
+        for line in plan.lines:
+            self.stdout.write("      %s" % line)
@@ -0,0 +1,188 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import hashlib
+import multiprocessing
+import os
+from collections import deque
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.template import loader
+from django.test import RequestFactory
+
+from linaro_django_pagination import settings
+from linaro_django_pagination.paginator import _ordering_keys, keyset_pages, simplified_count
+from linaro_django_pagination.warmer import load_queryset
+
+
+class CountedPaginator(Paginator):
+    """
+    Paginator of pages fetched elsewhere, which only knows their total count.
+    """
+
+    def __init__(self, count, per_page, orphans=0):
+        super(CountedPaginator, self).__init__([], per_page, orphans)
+        self.known_count = count
+
+    @property
+    def count(self):
+        return self.known_count
+
+
+def page_path(output, page_suffix, number):
+    """
+    Returns the file of the page of the given number.
+    """
+    if number == 1:
+        return os.path.join(output, 'index.html')
+    return os.path.join(output, 'page%s' % page_suffix, '%d.html' % number)
+
+
+def render_page(job):
+    """
+    Renders a page to its file unless the file already has the same content.
+    Returns whether the file was written.
+    """
+    (template_name, name, items, number, count, per_page, orphans, page_suffix,
+     path, output) = job
+    paginator = CountedPaginator(count, per_page, orphans)
+    page_obj = Page(items, number, paginator)
+    request = RequestFactory().get(path, {'page%s' % page_suffix: number} if number > 1 else {})
+    # autopaginate leaves the page as it is, see AutoPaginateNode.render
+    context = {
+        name: page_obj.object_list,
+        'paginator': paginator,
+        'page_obj': page_obj,
+        'page_suffix': page_suffix,
+        'request': request,
+    }
+    content = loader.get_template(template_name).render(context, request).encode('utf-8')
+    filename = page_path(output, page_suffix, number)
+    try:
+        with open(filename, 'rb') as stream:
+            if hashlib.sha1(stream.read()).digest() == hashlib.sha1(content).digest():
+                return False
+    except IOError:
+        pass
+    directory = os.path.dirname(filename)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:     # Made by another process meanwhile
+            pass
+    # Never leave a half written page to be served
+    with open(filename + '.tmp', 'wb') as stream:
+        stream.write(content)
+    os.rename(filename + '.tmp', filename)
+    return True
+
+
+class Command(BaseCommand):
+    help = ("Renders every page of a queryset paginated by a template to static files. The first "
+            "page goes to OUTPUT/index.html and the page at ?pageSUFFIX=N to OUTPUT/pageSUFFIX/N.html.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('queryset',
+                            help="Dotted path to the queryset, or to a function returning it.")
+        parser.add_argument('template', help="Template paginating the queryset with autopaginate.")
+        parser.add_argument('output', help="Directory to write the pages to.")
+        parser.add_argument('--name', default='object_list',
+                            help="Name of the queryset in the template, object_list by default.")
+        parser.add_argument('--per-page', type=int, default=settings.DEFAULT_PAGINATION, dest='per_page',
+                            help="Number of objects per page.")
+        parser.add_argument('--orphans', type=int, default=settings.DEFAULT_ORPHANS,
+                            help="Number of objects the last page may have on top of the others.")
+        parser.add_argument('--suffix', default='', help="Page suffix of the listing, such as _posts.")
+        parser.add_argument('--path', default='/', help="URL path of the listing.")
+        parser.add_argument('--processes', type=int, default=None,
+                            help="Number of processes rendering pages, one per CPU by default.")
+
+    def handle(self, *args, **options):
+        queryset = load_queryset(options['queryset'])
+        # Checks the ordering before any page is written, NULL values
+        # included as keyset_pages cannot get past them
+        try:
+            keys = _ordering_keys(queryset)
+        except ValueError as error:
+            raise CommandError(error)
+        for attname, descending in keys:
+            if queryset.filter(**{'%s__isnull' % attname: True}).exists():
+                raise CommandError("Cannot paginate objects with NULL %r" % attname)
+        count = simplified_count(queryset)
+        pages = keyset_pages(queryset, options['per_page'], options['orphans'])
+
+        jobs = ((options['template'], options['name'], items, number, count, options['per_page'],
+                 options['orphans'], options['suffix'], options['path'], options['output'])
+                for number, items in enumerate(pages, 1))
+        processes = options['processes'] or multiprocessing.cpu_count()
+        if processes > 1:
+            written = self.render_in_pool(jobs, processes)
+        else:
+            written = [render_page(job) for job in jobs]
+        removed = self.remove_pages(options['output'], options['suffix'], len(written))
+        self.stdout.write("%d pages, %d written, %d removed" % (len(written), sum(written), removed))
+
+    def render_in_pool(self, jobs, processes):
+        """
+        Renders the pages in a pool of processes while this one keeps
+        fetching them, with a few pages at most waiting to be rendered.
+        """
+        # Forked processes must not share the connections of this one
+        for connection in connections.all():
+            connection.close()
+        pool = multiprocessing.Pool(processes)
+        written = []
+        pending = deque()
+        try:
+            # Pages are fetched here, not in a thread of the pool
+            for job in jobs:
+                pending.append(pool.apply_async(render_page, (job,)))
+                if len(pending) > 2 * processes:
+                    written.append(pending.popleft().get())
+            written.extend(result.get() for result in pending)
+        finally:
+            pool.close()
+            pool.join()
+        return written
+
+    def remove_pages(self, output, page_suffix, num_pages):
+        """
+        Removes the files of the pages past the last one.
+        """
+        directory = os.path.dirname(page_path(output, page_suffix, 2))
+        removed = 0
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                number, extension = os.path.splitext(filename)
+                if extension == '.html' and number.isdigit() and int(number) > num_pages:
+                    os.remove(os.path.join(directory, filename))
+                    removed += 1
+        return removed
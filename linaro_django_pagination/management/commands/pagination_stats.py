@@ -0,0 +1,68 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from linaro_django_pagination.stats import METRICS, Histogram, collector
+
+
+class Command(BaseCommand):
+    help = "Prints the pagination statistics collected with PAGINATION_COLLECT_STATS."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', dest='json',
+                            help="Print the raw histograms as JSON.")
+        parser.add_argument('--reset', action='store_true', dest='reset',
+                            help="Forget the statistics after printing them.")
+
+    def handle(self, *args, **options):
+        listings = collector.load()
+        if options['json']:
+            self.stdout.write(json.dumps(listings, indent=2, sort_keys=True))
+        elif not listings:
+            self.stdout.write("No pagination statistics collected.")
+        else:
+            for listing in sorted(listings):
+                self.write_listing(listing, listings[listing])
+        if options['reset']:
+            collector.clear()
+
+    def write_listing(self, listing, histograms):
+        self.stdout.write(listing)
+        for metric, unit in METRICS:
+            if metric not in histograms:
+                continue
+            histogram = Histogram(**histograms[metric])
+            self.stdout.write(
+                "  %-12s n=%-8d mean=%.1f%s p50<=%s%s p95<=%s%s p99<=%s%s max=%.1f%s" % (
+                    metric, histogram.samples, histogram.total / histogram.samples, unit,
+                    histogram.percentile(50), unit, histogram.percentile(95), unit,
+                    histogram.percentile(99), unit, histogram.maximum, unit))
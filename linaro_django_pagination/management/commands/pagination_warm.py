@@ -0,0 +1,60 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from django.core.management.base import BaseCommand, CommandError
+
+from linaro_django_pagination.warmer import warm_up
+
+
+class Command(BaseCommand):
+    help = ("Counts hot querysets into PAGINATION_COUNT_CACHE and requests the first pages of hot URLs, "
+            "PAGINATION_WARM_UP by default, so that they are cached before taking traffic.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('entries', nargs='*',
+                            help="URL paths, or dotted paths to querysets or to functions returning them.")
+        parser.add_argument('--pages', type=int, default=1,
+                            help="Number of pages of each URL to request. Querysets are only counted.")
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help="Number of entries warmed up at a time.")
+        parser.add_argument('--host', default=None,
+                            help="Host of the requests, the first of ALLOWED_HOSTS by default.")
+
+    def handle(self, *args, **options):
+        results = warm_up(options['entries'] or None, options['pages'], options['concurrency'],
+                          host=options['host'])
+        failed = 0
+        for entry, elapsed, error in results:
+            if error is None:
+                self.stdout.write("%s %.3fs" % (entry, elapsed))
+            else:
+                self.stdout.write("%s failed: %s" % (entry, error))
+                failed += 1
+        if failed:
+            raise CommandError("%d of %d entries could not be warmed up" % (failed, len(results)))
@@ -28,6 +28,19 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import hashlib
+import re
+import time
+
+from django.http import HttpResponse
+from django.template import RequestContext
+from django.utils.cache import patch_vary_headers
+
+from linaro_django_pagination import settings
+from linaro_django_pagination.paginator import get_cache
+from linaro_django_pagination.prefetch import prefetcher
+from linaro_django_pagination.templatetags.pagination_tags import get_partial_template
+
 
 def get_page(self, suffix):
     """
@@ -52,3 +65,141 @@ class PaginationMiddleware(object):
     """
     def process_request(self, request):
         request.__class__.page = get_page
+
+    def process_template_response(self, request, response):
+        """
+        Renders only the ``{% paginate_partial %}`` content of the template for
+        requests with the ``PAGINATION_PARTIAL_HEADER`` header, followed by a
+        link to the next page and without counting.
+        """
+        if response.is_rendered:
+            return response
+        template = response.resolve_template(response.template_name)
+        # Render the template resolved here rather than resolving it again
+        response.template_name = template
+        partial_template = get_partial_template(template)
+        if partial_template is None:
+            return response
+        patch_vary_headers(response, (settings.PARTIAL_HEADER,))
+        if is_partial_request(request):
+            context = dict(response.context_data or {}, request=request, pagination_partial=True)
+            response.content = partial_template.render(RequestContext(request, context))
+        return response
+
+
+def is_partial_request(request):
+    """
+    Tells whether the request only asks for the next page of a listing.
+    """
+    header = 'HTTP_%s' % settings.PARTIAL_HEADER.upper().replace('-', '_')
+    return header in request.META
+
+
+# The page parameter, with or without a suffix
+PAGE_PARAMETER = re.compile(r'^page(_\w+)?$')
+
+# Parameters looking like suffixed page parameters that hold something else
+NOT_PAGE_PARAMETERS = frozenset(['page_size', 'page_count', 'page_length', 'page_limit'])
+
+
+def deepest_page(request):
+    """
+    Returns the highest page number the query string asks for, in ``page``
+    or ``page_<suffix>``, or 1. The body is not read, so that upload handlers
+    can still be changed by the view.
+    """
+    numbers = [1]
+    for key in request.GET:
+        if PAGE_PARAMETER.match(key) and key not in NOT_PAGE_PARAMETERS:
+            try:
+                numbers.append(int(request.GET[key]))
+            except ValueError:
+                pass
+    return max(numbers)
+
+
+class DeepPaginationBudgetMiddleware(object):
+    """
+    Limits each client to ``PAGINATION_DEEP_BUDGET`` requests for pages from
+    ``PAGINATION_DEEP_PAGE`` on within ``PAGINATION_DEEP_BUDGET_WINDOW``
+    seconds, to keep crawlers walking every page of every listing off the
+    database.
+
+    Over budget, requests are answered with a 429 status, or with
+    ``PAGINATION_DEEP_BUDGET_ACTION`` set to ``'count_free'`` paginated without
+    counting like with ``InfinitePaginator``.
+    """
+
+    def process_request(self, request):
+        budget = settings.DEEP_BUDGET
+        if budget is None or deepest_page(request) < settings.DEEP_PAGE:
+            return None
+        window = settings.DEEP_BUDGET_WINDOW
+        if self.spend(self.get_client_key(request), budget, window):
+            return None
+        if settings.DEEP_BUDGET_ACTION == 'count_free':
+            request.pagination_count_free = True
+            return None
+        response = HttpResponse("Too many requests for deep pages.", status=429, content_type='text/plain')
+        response['Retry-After'] = str(window)
+        return response
+
+    def get_client_key(self, request):
+        """
+        Returns the key the budget of the client making request is kept under:
+        the user when authenticated, else the IP address.
+        """
+        user = getattr(request, 'user', None)
+        if user is not None:
+            authenticated = user.is_authenticated
+            if callable(authenticated):     # Django < 1.10
+                authenticated = authenticated()
+            if authenticated:
+                return 'user:%s' % user.pk
+        return 'ip:%s' % request.META.get('REMOTE_ADDR')
+
+    def spend(self, client, budget, window):
+        """
+        Counts a deep page request of client, unless the client already made
+        budget of them over the last window seconds. Returns whether it was
+        counted.
+        """
+        cache = get_cache(settings.DEEP_BUDGET_CACHE)
+        now = time.time()
+        current = int(now // window)
+        prefix = 'linaro_django_pagination.deep.%s.' % hashlib.md5(client.encode('utf-8')).hexdigest()
+        counts = cache.get_many([prefix + str(current - 1), prefix + str(current)])
+        # The sliding window still covers the end of the previous fixed one,
+        # whose requests are assumed to be evenly spread
+        overlap = 1 - (now % window) / float(window)
+        spent = counts.get(prefix + str(current - 1), 0) * overlap + counts.get(prefix + str(current), 0)
+        if spent >= budget:
+            return False
+        key = prefix + str(current)
+        if not cache.add(key, 1, 2 * window):
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Expired in the meantime
+                cache.set(key, 1, 2 * window)
+        return True
+
+
+class NextPagePrefetchMiddleware(object):
+    """
+    Announces the next pages remembered with ``PAGINATION_PREFETCH_NEXT`` in
+    ``Link`` headers, for browsers and caching proxies to prefetch, and
+    prefetches their rows into ``PAGINATION_PREFETCH_CACHE``.
+    """
+
+    def process_response(self, request, response):
+        next_pages = getattr(request, 'pagination_next_pages', None)
+        if not next_pages or response.status_code != 200:
+            return response
+        links = ['<%s>; rel=prefetch' % url for url, paginator, number in next_pages]
+        if response.has_header('Link'):
+            links.insert(0, response['Link'])
+        response['Link'] = ', '.join(links)
+        for url, paginator, number in next_pages:
+            prefetcher.submit(paginator, number)
+        return response
@@ -29,7 +29,825 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
+import hashlib
+import heapq
+import operator
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import reduce
+from itertools import islice
+from timeit import default_timer
+
 from django.core.paginator import Paginator, Page, PageNotAnInteger, EmptyPage
+from django.db import OperationalError, close_old_connections, connections, transaction
+from django.db.models import Count, Q
+from django.db.models.query import QuerySet
+
+from linaro_django_pagination import settings, signals
+
+try:
+    from django.db.models.expressions import Col, RawSQL
+    from django.db.models.lookups import Lookup
+    from django.db.models.sql.constants import LOUTER
+    from django.db.models.sql.where import WhereNode
+except ImportError:     # Django < 1.8
+    Col = None
+
+try:
+    from django.utils.six import string_types
+except ImportError:     # Django >= 3.0
+    string_types = (str,)
+
+try:
+    from django.core.cache import caches
+
+    def get_cache(alias):
+        return caches[alias]
+except ImportError:     # Django < 1.7
+    from django.core.cache import get_cache
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:     # Python 2 without the futures backport
+    ThreadPoolExecutor = None
+
+
+def _is_reversible(object_list):
+    """
+    Checks whether the ordering of object_list can be reversed in the database.
+
+    Orderings given to ``extra()`` are left alone, and so are querysets with
+    DISTINCT ON fields, which would keep other rows of each group once
+    reversed.
+    """
+    return (isinstance(object_list, QuerySet) and
+            object_list.ordered and
+            object_list.query.can_filter() and
+            not object_list.query.extra_order_by and
+            not getattr(object_list.query, 'distinct_fields', None))
+
+
+def _total_ordering(queryset):
+    """
+    Returns queryset ordered by its primary key after its own ordering, so
+    that no two rows compare equal, or None if that would change its rows.
+    """
+    query = queryset.query
+    if query.extra_order_by:
+        ordering = list(query.extra_order_by)
+    elif query.order_by:
+        ordering = list(query.order_by)
+    elif query.default_ordering:
+        ordering = list(query.get_meta().ordering)
+    else:
+        ordering = []
+    pk = query.get_meta().pk
+    names = [name.lstrip('-+') for name in ordering if isinstance(name, string_types)]
+    if '?' in names:
+        return None
+    if 'pk' in names or pk.name in names or pk.attname in names:
+        return queryset
+    if query.distinct and getattr(queryset, '_fields', None):
+        # Ordering by the primary key would add it to the distinct columns
+        return None
+    if query.extra_order_by:
+        # order_by() would drop the ordering given to extra()
+        return queryset.extra(order_by=ordering + ['pk'])
+    return queryset.order_by(*(ordering + ['pk']))
+
+
+class CountTimeout(Exception):
+    """
+    Raised when counting an object list takes longer than allowed.
+    """
+
+
+# How many SQLite virtual machine instructions run between two time checks
+SQLITE_PROGRESS_INSTRUCTIONS = 1000
+
+
+@contextmanager
+def count_time_limit(using, timeout):
+    """
+    Limits the time the queries run in the block may take to timeout seconds
+    and raises CountTimeout when they take longer.
+
+    PostgreSQL enforces a statement_timeout and SQLite is interrupted by a
+    progress handler. Other databases run the queries without a limit.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        # The savepoint keeps an outer transaction usable after a timeout
+        with transaction.atomic(using=using):
+            cursor = connection.cursor()
+            cursor.execute('SHOW statement_timeout')
+            previous = cursor.fetchone()[0]
+            cursor.execute('SET LOCAL statement_timeout = %s', [max(1, int(timeout * 1000))])
+            try:
+                yield
+            except OperationalError as exc:
+                if getattr(exc.__cause__, 'pgcode', None) == '57014':  # query_canceled
+                    raise CountTimeout('Counting took longer than %s seconds' % timeout)
+                raise
+            cursor.execute('SET LOCAL statement_timeout = %s', [previous])
+    elif connection.vendor == 'sqlite':
+        deadline = time.time() + timeout
+        connection.ensure_connection()
+        connection.connection.set_progress_handler(
+            lambda: time.time() > deadline, SQLITE_PROGRESS_INSTRUCTIONS)
+        try:
+            yield
+        except OperationalError as exc:
+            if 'interrupted' in str(exc):
+                raise CountTimeout('Counting took longer than %s seconds' % timeout)
+            raise
+        finally:
+            connection.connection.set_progress_handler(None, SQLITE_PROGRESS_INSTRUCTIONS)
+    else:
+        yield
+
+
+def _collect_aliases(node, aliases):
+    """
+    Collects the table aliases referenced by a part of the WHERE clause.
+
+    Returns False when the node contains SQL that may reference any table,
+    such as ``extra(where=...)`` or raw SQL expressions.
+    """
+    if isinstance(node, WhereNode):
+        children = node.children
+    elif isinstance(node, Lookup):
+        children = [node.lhs, node.rhs]
+    elif isinstance(node, Col):
+        aliases.add(node.alias)
+        return True
+    elif isinstance(node, RawSQL):
+        return False
+    elif hasattr(node, 'get_source_expressions'):
+        children = node.get_source_expressions()
+    elif isinstance(node, (list, tuple)):
+        children = node
+    elif hasattr(node, 'as_sql'):
+        return False
+    else:
+        # Plain values and subqueries, which use their own aliases
+        return True
+    return all(_collect_aliases(child, aliases) for child in children)
+
+
+def _preserves_rows(join):
+    """
+    Checks whether a join matches exactly one row for each row it joins from.
+    """
+    field = join.join_field
+    to_one = getattr(field, 'many_to_one', False) or getattr(field, 'one_to_one', False)
+    return to_one and (join.join_type == LOUTER or not join.nullable)
+
+
+def _trim_joins(query):
+    """
+    Removes joins that neither the WHERE clause nor other joins need and that
+    cannot change the number of rows.
+    """
+    aliases = set()
+    if query.extra_tables or not _collect_aliases(query.where, aliases):
+        return
+    keep = set()
+    for alias, join in query.alias_map.items():
+        if query.alias_refcount[alias] and (
+                alias in aliases or join.parent_alias is None or not _preserves_rows(join)):
+            while alias is not None and alias not in keep:
+                keep.add(alias)
+                alias = query.alias_map[alias].parent_alias
+    for alias in query.alias_map:
+        if alias not in keep:
+            query.alias_refcount[alias] = 0
+
+
+def _orders_by_local_fields(query):
+    """
+    Checks whether the ordering of the query only uses columns of its model.
+    """
+    if query.order_by:
+        ordering = query.order_by
+    elif query.default_ordering:
+        ordering = query.get_meta().ordering
+    else:
+        ordering = ()
+    return all(isinstance(name, string_types) and '__' not in name and name != '?' for name in ordering)
+
+
+def simplified_count(queryset):
+    """
+    Returns the number of rows in queryset, stripping whatever cannot change
+    that number from the COUNT query first.
+
+    ``QuerySet.count()`` wraps querysets with annotations or ``distinct()``
+    in a subquery that computes every annotation and join. Annotations
+    without aggregates and joins to a single related row are dropped instead,
+    and ``distinct()`` over the columns of the model alone is counted as
+    ``COUNT(DISTINCT pk)``. Anything else is counted as usual.
+    """
+    query = queryset.query
+    if (Col is None or not query.can_filter() or query.group_by is not None or
+            query.select_for_update):
+        return queryset.count()
+    if query.distinct:
+        if (query.distinct_fields or query.select or query.extra_select or
+                query.annotations or not query.default_cols or
+                not _orders_by_local_fields(query)):
+            return queryset.count()
+        queryset = queryset.order_by()
+        queryset.query.distinct = False
+        _trim_joins(queryset.query)
+        aggregate = queryset.aggregate(pagination_count=Count('pk', distinct=True))
+        return aggregate['pagination_count']
+    if any(annotation.contains_aggregate for annotation in query.annotations.values()):
+        return queryset.count()
+    queryset = queryset.all()
+    # Filters on annotations keep their own copy of the expression
+    queryset.query.annotations.clear()
+    queryset.query.set_annotation_mask(None)
+    _trim_joins(queryset.query)
+    return queryset.count()
+
+
+def _ordering_keys(queryset):
+    """
+    Returns the attribute names of the ordering of queryset, with the primary
+    key added to break ties, as (attname, descending) pairs.
+
+    Raises ValueError for orderings using anything else than fields of the
+    model, relations included.
+    """
+    query = queryset.query
+    if query.order_by:
+        ordering = query.order_by
+    elif query.default_ordering:
+        ordering = query.get_meta().ordering
+    else:
+        ordering = ()
+    if not ordering or not _orders_by_local_fields(query):
+        raise ValueError("Cannot compare objects in the ordering %r" % (tuple(ordering),))
+    opts = query.get_meta()
+    keys = []
+    for name in ordering:
+        descending = name.startswith('-')
+        name = name.lstrip('-+')
+        field = opts.pk if name == 'pk' else opts.get_field(name)
+        if field.is_relation and name != field.attname:
+            # Relations are ordered by the ordering of the related model
+            raise ValueError("Cannot compare objects in the ordering of %r" % name)
+        keys.append((field.attname, descending))
+        if field.primary_key:
+            break
+    else:
+        keys.append((opts.pk.attname, False))
+    return keys
+
+
+def _keyset_filter(keys, obj, before=False):
+    """
+    Returns the filter of the rows ordered after obj by keys, or before it.
+    """
+    # These rows share the values of the first keys and come after obj on
+    # the next one
+    conditions = []
+    equal = Q()
+    for attname, descending in keys:
+        value = getattr(obj, attname)
+        if value is None:
+            raise ValueError("Cannot compare objects with NULL %r" % attname)
+        lookup = '%s__%s' % (attname, 'gt' if descending == before else 'lt')
+        conditions.append(equal & Q(**{lookup: value}))
+        equal &= Q(**{attname: value})
+    return reduce(operator.or_, conditions)
+
+
+def rank_of(queryset, obj):
+    """
+    Returns the 0-based position of obj in queryset, found by counting the
+    rows ordered before it in a single query.
+
+    The ordering of queryset may only use fields of its model, and the primary
+    key is added to it to break ties. obj is expected to be in queryset, and to
+    have no NULL in the fields of the ordering. ValueError is raised when the
+    position cannot be counted.
+    """
+    if not queryset.query.can_filter():
+        raise ValueError("Cannot rank objects in a sliced queryset")
+    return simplified_count(queryset.filter(_keyset_filter(_ordering_keys(queryset), obj, before=True)))
+
+
+def keyset_pages(queryset, per_page, orphans=0):
+    """
+    Yields the objects of each page of queryset, continuing every query after
+    the last object of the previous page rather than at an offset, so that
+    deep pages cost as much as the first one.
+
+    The ordering of queryset may only use fields of its model, without NULL
+    values. The last page holds its orphans as usual.
+    """
+    keys = _ordering_keys(queryset)
+    queryset = queryset.order_by(*['-%s' % attname if descending else attname for attname, descending in keys])
+    rows = queryset
+    limit = per_page + orphans + 1
+    first = True
+    while True:
+        items = list(rows[:limit])
+        if len(items) < limit:
+            # The first page is displayed even when empty
+            if items or first:
+                yield items
+            return
+        yield items[:per_page]
+        rows = queryset.filter(_keyset_filter(keys, items[per_page - 1]))
+        first = False
+
+
+class _Descending(object):
+    """
+    Sort key sorting the other way round than the value it wraps.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def ordering_key(queryset):
+    """
+    Returns a function computing sort keys of the objects of queryset that
+    follow its ordering, which may only use fields of its model.
+    """
+    keys = _ordering_keys(queryset)
+
+    def key(obj):
+        return tuple(_Descending(getattr(obj, attname)) if descending else getattr(obj, attname)
+                     for attname, descending in keys)
+    return key
+
+
+def _validate_page_number(number):
+    """
+    Validates the given 1-based page number without looking at the count.
+    """
+    try:
+        number = int(number)
+    except (TypeError, ValueError):
+        raise PageNotAnInteger('That page number is not an integer')
+    if number < 1:
+        raise EmptyPage('That page number is less than 1')
+    return number
+
+
+def _supports_window_count(object_list):
+    """
+    Checks whether object_list can be fetched with COUNT(*) OVER () attached.
+
+    Only plain model querysets qualify: DISTINCT is applied after window
+    functions so the count would be wrong, values() querysets do not have
+    instances to carry the extra column, and grouped querysets, such as those
+    with aggregate annotations, would group by it.
+    """
+    if not (isinstance(object_list, QuerySet) and
+            getattr(object_list, '_fields', None) is None and
+            object_list.query.can_filter() and
+            object_list.query.group_by is None and
+            not object_list.query.distinct):
+        return False
+    connection = connections[object_list.db]
+    supported = getattr(connection.features, 'supports_over_clause', None)
+    if supported is not None:
+        return supported
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 25, 0)
+    return connection.vendor in ('postgresql', 'oracle')
+
+
+def _query_cache_key(prefix, queryset):
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except Exception:   # EmptyResultSet, or anything else not worth caching
+        return None
+    digest = hashlib.md5(('%s\n%s\n%r' % (queryset.db, sql, params)).encode('utf-8')).hexdigest()
+    return 'linaro_django_pagination.%s.%s' % (prefix, digest)
+
+
+def count_cache_key(queryset):
+    """
+    Returns the cache key of the count of queryset, or None if its query
+    cannot be told apart from others.
+
+    The ordering does not change the count, so it is left out of the key,
+    which is then shared by paginators adding to it, except for DISTINCT
+    queries whose rows may depend on it.
+    """
+    if not queryset.query.distinct:
+        queryset = queryset.order_by()
+    return _query_cache_key('count', queryset)
+
+
+def page_cache_key(queryset):
+    """
+    Returns the cache key of the rows of queryset, the slice of a page, or
+    None if its query cannot be told apart from others.
+    """
+    return _query_cache_key('page', queryset)
+
+
+class SimpleCountPaginator(Paginator):
+    """
+    Paginator that counts querysets with ``simplified_count()``.
+
+    The count query can be sent to another database, typically a read
+    replica, by passing its alias as count_using. Passing page_using does the
+    same for the queries fetching the pages. Passing count_timeout limits the
+    time the count query may take, in seconds, after which CountTimeout is
+    raised. Passing the alias of a cache as count_cache keeps counts there
+    for count_cache_timeout seconds, count_cached telling whether the count
+    came from there. Object lists that are not querysets ignore all of these.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True,
+                 count_using=None, page_using=None, count_timeout=None, count_cache=None,
+                 count_cache_timeout=None):
+        if page_using is not None and isinstance(object_list, QuerySet):
+            object_list = object_list.using(page_using)
+        super(SimpleCountPaginator, self).__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.count_using = count_using
+        self.count_timeout = count_timeout
+        self.count_cache = count_cache
+        self.count_cache_timeout = count_cache_timeout
+        # Seconds spent counting, once counted
+        self.count_time = None
+        self.count_cached = False
+
+    def _get_count(self):
+        """
+        Returns the total number of objects, across all pages.
+        """
+        if self._count is None and isinstance(self.object_list, QuerySet):
+            queryset = self.object_list
+            if self.count_using is not None:
+                queryset = queryset.using(self.count_using)
+            cache_key = None
+            if self.count_cache is not None:
+                cache_key = count_cache_key(queryset)
+            if cache_key is not None:
+                self._count = get_cache(self.count_cache).get(cache_key)
+                self.count_cached = self._count is not None
+            if self._count is None:
+                self._count = self._count_queryset(queryset)
+                if cache_key is not None:
+                    get_cache(self.count_cache).set(cache_key, self._count, self.count_cache_timeout)
+        return super(SimpleCountPaginator, self)._get_count()
+    count = property(_get_count)
+
+    def _count_queryset(self, queryset):
+        """
+        Counts queryset, timing the count.
+        """
+        started = default_timer()
+        if self.count_timeout is not None:
+            with count_time_limit(queryset.db, self.count_timeout):
+                count = simplified_count(queryset)
+        else:
+            count = simplified_count(queryset)
+        self.count_time = default_timer() - started
+        signals.paginator_counted.send(
+            sender=self.__class__, paginator=self, count=count,
+            count_time=self.count_time, using=queryset.db)
+        return count
+
+    def page_of(self, obj):
+        """
+        Returns the number of the page obj is on.
+
+        Querysets are ranked with ``rank_of()``, so only the object list of
+        paginators with orphans is counted, to tell whether the last page is
+        merged into the previous one.
+        """
+        if isinstance(self.object_list, QuerySet):
+            queryset = self.object_list
+            if self.count_using is not None:
+                queryset = queryset.using(self.count_using)
+            rank = rank_of(queryset, obj)
+        else:
+            rank = list(self.object_list).index(obj)
+        number = rank // self.per_page + 1
+        if self.orphans:
+            number = min(number, self.num_pages)
+        return number
+
+
+class ReversingPaginator(SimpleCountPaginator):
+    """
+    Paginator that fetches pages from the second half of an ordered QuerySet by
+    running the query with its ordering reversed.
+
+    Databases implement OFFSET by reading and throwing away rows, so the last
+    page of a big table usually costs as much as scanning the whole table.
+    Since the total count is known anyway, such pages are fetched with a small
+    offset from the other end and put back in order in Python, which makes the
+    last page as cheap as the first one.
+
+    Rows that compare equal would be split differently between pages fetched
+    from either end, so the primary key is added to the end of orderings
+    lacking it, for pages in both directions. Querysets whose ordering cannot
+    be completed, and anything that is not an ordered QuerySet, are
+    paginated as usual. So are all pages when the count came from the count
+    cache or from another database than the pages, as reversing from a count
+    that does not match the rows would return the wrong ones.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ReversingPaginator, self).__init__(*args, **kwargs)
+        self.reversible = False
+        if _is_reversible(self.object_list):
+            object_list = _total_ordering(self.object_list)
+            if object_list is not None:
+                self.object_list = object_list
+                self.reversible = True
+
+    def page(self, number):
+        """
+        Returns a Page object for the given 1-based page number.
+        """
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        # Counts from the cache or from another database may not match the
+        # rows, and reversing from them would skip or repeat some
+        if (self.count - top < bottom and self.reversible and not self.count_cached and
+                self.count_using in (None, self.object_list.db)):
+            reversed_items = self.object_list.reverse()[self.count - top:self.count - bottom]
+            page_items = list(reversed_items)[::-1]
+        else:
+            page_items = self.object_list[bottom:top]
+        return Page(page_items, number, self)
+
+
+class WindowCountPaginator(SimpleCountPaginator):
+    """
+    Paginator that fetches the rows of a page and the total count in a single
+    query by annotating the page with ``COUNT(*) OVER ()``.
+
+    Every page normally costs two round trips to the database, one for the
+    count and one for the rows. On backends with window functions (PostgreSQL
+    and SQLite 3.25 or newer) this paginator needs only one. When the
+    requested page is out of range no rows come back to carry the total, so
+    a plain count is made to validate the page number. Object lists that
+    cannot carry the extra column are paginated as usual.
+    """
+
+    count_alias = 'pagination_window_count'
+
+    def page(self, number):
+        """
+        Returns a Page object for the given 1-based page number.
+        """
+        if self._count is not None or not _supports_window_count(self.object_list):
+            return super(WindowCountPaginator, self).page(number)
+        number = _validate_page_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        queryset = self.object_list.extra(select={self.count_alias: 'COUNT(*) OVER ()'})
+        # Fetch the orphans as well, they belong to this page if it is the last
+        page_items = list(queryset[bottom:top + self.orphans])
+        if not page_items:
+            # Out of range, or an empty first page: validate with a real count
+            number = self.validate_number(number)
+            return Page([], number, self)
+        self._count = getattr(page_items[0], self.count_alias)
+        for item in page_items:
+            delattr(item, self.count_alias)
+        # The rows may belong to the previous page as its orphans
+        number = self.validate_number(number)
+        if top + self.orphans >= self._count:
+            top = self._count
+        return Page(page_items[:top - bottom], number, self)
+
+
+class LazyCountPaginator(SimpleCountPaginator):
+    """
+    Paginator that fetches the rows of a page first and only counts the
+    object list when the total cannot be told from the page itself.
+
+    One row past the page (and its orphans) is fetched as well. When it is
+    missing the requested page is the last one and the total is simply the
+    offset plus the number of rows fetched, so listings that fit on a single
+    page never run COUNT. Otherwise the count is left for whoever asks for it,
+    usually the pagination control.
+    """
+
+    def page(self, number):
+        """
+        Returns a Page object for the given 1-based page number.
+        """
+        if self._count is not None:
+            return super(LazyCountPaginator, self).page(number)
+        number = _validate_page_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        page_items = list(self.object_list[bottom:top + self.orphans + 1])
+        if len(page_items) > self.per_page + self.orphans:
+            return Page(page_items[:self.per_page], number, self)
+        if not page_items and number > 1:
+            raise EmptyPage('That page contains no results')
+        self._count = bottom + len(page_items)
+        # The rows may still belong to the previous page as its orphans
+        number = self.validate_number(number)
+        return Page(page_items, number, self)
+
+
+def _closing_connections(function):
+    """
+    Wraps function to close the database connections it opened in a worker
+    thread, which would otherwise stay open until the thread ends.
+    """
+    def call(*args):
+        try:
+            return function(*args)
+        finally:
+            for connection in connections.all():
+                connection.close()
+    return call
+
+
+def _reusing_connections(function):
+    """
+    Wraps function to close the database connections of a pool thread only
+    once they are past ``CONN_MAX_AGE`` or unusable, as Django does between
+    requests, keeping them open for the next call otherwise.
+    """
+    def call(*args):
+        try:
+            return function(*args)
+        finally:
+            close_old_connections()
+    return call
+
+
+class SourcePool(object):
+    """
+    Threads shared by all MergePaginators, started on first use, so that
+    requests do not each start and stop their own. At most
+    ``PAGINATION_MERGE_WORKERS`` sources are fetched or counted at a time
+    across all requests, the others waiting for a thread. Each thread keeps
+    its database connections for ``CONN_MAX_AGE``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def map(self, function, items):
+        """
+        Returns the results of function for each of items, computed in the
+        threads of the pool.
+        """
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=settings.MERGE_WORKERS)
+        return list(self.executor.map(_reusing_connections(function), items))
+
+
+source_pool = SourcePool()
+
+
+class MergePaginator(Paginator):
+    """
+    Paginator over the merged ordering of several sources, such as querysets
+    of partitioned tables or on different databases.
+
+    The object list is a sequence of sources, querysets or lists, sorted in
+    the same order. To get a page only its last row and the rows before it
+    are fetched from each source, and merged. The count is the sum of the
+    counts of the sources, taken first so that pages out of range are not
+    fetched. Sources are fetched and counted concurrently in the threads of
+    ``source_pool``, up to max_workers of them at a time, all of them by
+    default. With max_workers set to 1 they are fetched one after the other
+    in the calling thread.
+
+    Objects are compared by key, which defaults to the ordering of the first
+    queryset. It must then only use fields of the model.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, key=None,
+                 max_workers=None):
+        object_list = list(object_list)
+        super(MergePaginator, self).__init__(object_list, per_page, orphans, allow_empty_first_page)
+        if key is None:
+            querysets = [source for source in object_list if isinstance(source, QuerySet)]
+            key = ordering_key(querysets[0]) if querysets else (lambda obj: obj)
+        self.key = key
+        self.max_workers = len(object_list) if max_workers is None else max_workers
+        # Seconds spent counting, once counted
+        self.count_time = None
+        self.count_cached = False
+
+    def _map(self, function):
+        """
+        Returns the results of function for each source.
+        """
+        sources = self.object_list
+        if ThreadPoolExecutor is None or not settings.MERGE_WORKERS or self.max_workers < 2 or len(sources) < 2:
+            return [function(source) for source in sources]
+        results = []
+        for start in range(0, len(sources), self.max_workers):
+            results.extend(source_pool.map(function, sources[start:start + self.max_workers]))
+        return results
+
+    @staticmethod
+    def _count_source(source):
+        if isinstance(source, QuerySet):
+            return simplified_count(source)
+        return len(source)
+
+    def _get_count(self):
+        """
+        Returns the total number of objects, across all pages.
+        """
+        if self._count is None:
+            started = default_timer()
+            self._count = sum(self._map(self._count_source))
+            self.count_time = default_timer() - started
+        return self._count
+    count = property(_get_count)
+
+    def page(self, number):
+        """
+        Returns a Page object for the given 1-based page number.
+        """
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        source_rows = self._map(lambda source: list(source[:top]))
+        # Sources and positions break ties so that objects are never compared
+        merged = heapq.merge(*[((self.key(obj), index, position, obj) for position, obj in enumerate(rows))
+                               for index, rows in enumerate(source_rows)])
+        return Page([obj for k, index, position, obj in islice(merged, bottom, top)], number, self)
+
+
+class StreamedObjectList(object):
+    """
+    Object list of a page that loads its objects in chunks while being
+    iterated over, instead of all at once.
+
+    Its length is known without fetching the page, so templates can loop over
+    it with ``{% for %}``. Every iteration runs the query again.
+    """
+
+    def __init__(self, queryset, chunk_size, length=None):
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+        self.length = length
+
+    def __len__(self):
+        if self.length is None:
+            self.length = self.queryset.count()
+        return self.length
+
+    def __iter__(self):
+        try:
+            return iter(self.queryset.iterator(chunk_size=self.chunk_size))
+        except TypeError:   # Django < 2.0 always fetches 100 rows at a time
+            return iter(self.queryset.iterator())
+
+
+def stream_page(page, chunk_size, fields=None):
+    """
+    Makes the page load its objects in chunks of chunk_size, as dictionaries
+    of the given fields if any. Pages of lists, or already fetched, are left
+    as they are.
+    """
+    object_list = page.object_list
+    if not isinstance(object_list, QuerySet) or object_list._result_cache is not None:
+        return page
+    try:
+        page.paginator.count
+    except NotImplementedError:
+        length = None
+    else:
+        length = page.end_index() - page.start_index() + 1 if page.paginator.count else 0
+    if fields:
+        object_list = object_list.values(*fields)
+    page.object_list = StreamedObjectList(object_list, chunk_size, length)
+    return page
 
 
 class InfinitePaginator(Paginator):
@@ -151,7 +969,7 @@ class FinitePaginator(InfinitePaginator):
     the full collection in order to get the page start_index.
 
     This is a very silly class but useful if you love the Django pagination
-    conventions.
+    conventions. RemotePaginator fetches the items itself instead.
     """
 
     def __init__(self, object_list_plus, per_page, offset=None, allow_empty_first_page=True,
@@ -185,12 +1003,7 @@ class FinitePage(InfinitePage):
         """
         Checks for one more item than last on this page.
         """
-        try:
-            self.paginator.object_list[self.paginator.per_page]
-        # FIXME: this statement is never reached, which is a bug
-        except IndexError:
-            return False
-        return True
+        return len(self.paginator.object_list) > self.paginator.per_page
 
     def start_index(self):
         """
@@ -199,3 +1012,184 @@ class FinitePage(InfinitePage):
         """
         # TODO should this holler if you haven't defined the offset?
         return self.paginator.offset
+
+
+class _PendingFetch(object):
+    """
+    Fetch of a remote source running in some thread, which other threads
+    wait for rather than fetching the same items again.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.items = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.items
+
+
+class RemoteSource(object):
+    """
+    Items fetched from a remote source, such as an API, with fetch(offset,
+    limit) returning a sequence of at most limit items.
+
+    The last cache_size results are kept, and concurrent requests for the same
+    items share a single fetch. Sources meant to be shared between requests
+    are safe to use from several threads.
+    """
+
+    def __init__(self, fetch, cache_size=32):
+        self.fetch = fetch
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get(self, offset, limit):
+        """
+        Returns the items fetched from offset.
+        """
+        key = (offset, limit)
+        with self._lock:
+            if key in self._cache:
+                items = self._cache[key] = self._cache.pop(key)
+                return items
+            pending = self._pending.get(key)
+            if pending is not None:
+                fetching = False
+            else:
+                pending = self._pending[key] = _PendingFetch()
+                fetching = True
+        if not fetching:
+            return pending.wait()
+        try:
+            pending.items = list(self.fetch(offset, limit))
+        except Exception as error:
+            pending.error = error
+        with self._lock:
+            del self._pending[key]
+            if pending.error is None:
+                self._cache[key] = pending.items
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        pending.done.set()
+        return pending.wait()
+
+    def prefetch(self, offset, limit):
+        """
+        Fetches the items from offset in a background thread, unless they are
+        already fetched or being fetched.
+        """
+        with self._lock:
+            if (offset, limit) in self._cache or (offset, limit) in self._pending:
+                return
+        thread = threading.Thread(target=self._prefetch, args=(offset, limit))
+        thread.daemon = True
+        thread.start()
+
+    def _prefetch(self, offset, limit):
+        try:
+            self.get(offset, limit)
+        except Exception:
+            # Whoever asks for these items gets the error of their own fetch
+            pass
+
+
+class RemotePaginator(Paginator):
+    """
+    Paginator for items fetched from a remote source, such as an API, when
+    it is not important to know how many there are.
+
+    The object list is a RemoteSource, or a fetch(offset, limit) function to
+    make one. One item past the page and its orphans is fetched to tell
+    whether there is a next page. While the page is displayed the next one is
+    fetched in a background thread, unless prefetch is False. By default only
+    RemoteSources are prefetched from, as the source made for a function goes
+    away with the paginator, along with what was prefetched into it.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, prefetch=None):
+        if prefetch is None:
+            prefetch = isinstance(object_list, RemoteSource)
+        if not isinstance(object_list, RemoteSource):
+            object_list = RemoteSource(object_list)
+        super(RemotePaginator, self).__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.prefetch = prefetch
+
+    def validate_number(self, number):
+        """
+        Validates the given 1-based page number without looking at the count.
+        """
+        return _validate_page_number(number)
+
+    def page(self, number):
+        """
+        Returns a Page object for the given 1-based page number.
+        """
+        number = self.validate_number(number)
+        offset = (number - 1) * self.per_page
+        limit = self.per_page + self.orphans + 1
+        items = self.object_list.get(offset, limit)
+        if not items and not (number == 1 and self.allow_empty_first_page):
+            raise EmptyPage('That page contains no results')
+        has_next = len(items) == limit
+        if has_next:
+            items = items[:self.per_page]
+            if self.prefetch:
+                self.object_list.prefetch(offset + self.per_page, limit)
+        return RemotePage(items, number, self, has_next)
+
+    def _get_count(self):
+        """
+        Returns the total number of objects, across all pages.
+        """
+        raise NotImplementedError
+    count = property(_get_count)
+
+    def _get_num_pages(self):
+        """
+        Returns the total number of pages.
+        """
+        raise NotImplementedError
+    num_pages = property(_get_num_pages)
+
+    def _get_page_range(self):
+        """
+        Returns a 1-based range of pages for iterating through within
+        a template for loop.
+        """
+        raise NotImplementedError
+    page_range = property(_get_page_range)
+
+
+class RemotePage(Page):
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super(RemotePage, self).__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def __repr__(self):
+        return '<Page %s>' % self.number
+
+    def has_next(self):
+        return self._has_next
+
+    def start_index(self):
+        """
+        Returns the 1-based index of the first object on this page,
+        relative to total objects in the paginator.
+        """
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        """
+        Returns the 1-based index of the last object on this page,
+        relative to total objects found (hits).
+        """
+        return (self.number - 1) * self.paginator.per_page + len(self.object_list)
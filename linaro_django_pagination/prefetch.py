@@ -0,0 +1,204 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Speculative prefetching of next pages.
+
+With ``PAGINATION_PREFETCH_NEXT``, paginating a listing remembers its next
+page on the request. ``NextPagePrefetchMiddleware`` then announces these pages
+with ``Link: <...>; rel=prefetch`` headers and, once the response is ready,
+fetches their rows into ``PAGINATION_PREFETCH_CACHE`` from a pool of
+``PAGINATION_PREFETCH_WORKERS`` threads. Paginating the next page takes its
+rows from the cache instead of querying them.
+
+Only the pages of querysets counted before their pages are fetched are
+prefetched, not those of ``InfinitePaginator``, ``LazyCountPaginator`` or
+``WindowCountPaginator``, which would count only to look the page up.
+"""
+
+import logging
+import threading
+
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models.query import QuerySet
+
+from linaro_django_pagination import settings
+from linaro_django_pagination.paginator import (
+    InfinitePaginator,
+    LazyCountPaginator,
+    ThreadPoolExecutor,
+    WindowCountPaginator,
+    _reusing_connections,
+    get_cache,
+    page_cache_key,
+)
+
+
+logger = logging.getLogger('linaro_django_pagination.prefetch')
+
+
+def page_url(request, page_suffix, number):
+    """
+    Returns the URL of the page number of the listing with page_suffix, the
+    other parameters of request kept.
+    """
+    params = request.GET.copy()
+    params['page%s' % page_suffix] = number
+    return '%s?%s' % (request.path, params.urlencode())
+
+
+def prefetchable(paginator):
+    """
+    Tells whether the pages of paginator can be prefetched: those of
+    paginators counting their queryset.
+    """
+    return (isinstance(paginator, Paginator) and not isinstance(paginator, InfinitePaginator) and
+            isinstance(paginator.object_list, QuerySet))
+
+
+def counts_first(paginator):
+    """
+    Tells whether paginator counts its queryset before fetching a page, so
+    that looking the page up in the prefetch cache costs no extra query.
+    """
+    return prefetchable(paginator) and not isinstance(paginator, (LazyCountPaginator, WindowCountPaginator))
+
+
+def page_slice(paginator, number):
+    """
+    Returns the validated page number and the slice of the queryset of
+    paginator holding its rows, whatever way paginator fetches them.
+    """
+    number = paginator.validate_number(number)
+    bottom = (number - 1) * paginator.per_page
+    top = bottom + paginator.per_page
+    if top + paginator.orphans >= paginator.count:
+        top = paginator.count
+    return number, paginator.object_list[bottom:top]
+
+
+def prefetched_page(paginator, number):
+    """
+    Returns the page number of paginator if its rows were prefetched, or
+    None. Raises CountTimeout if counting took too long, the count not being
+    worth trying again.
+    """
+    if not counts_first(paginator):
+        return None
+    try:
+        number, rows = page_slice(paginator, number)
+    except InvalidPage:
+        # Left for the paginator to deal with
+        return None
+    key = page_cache_key(rows)
+    if key is None:
+        return None
+    rows = get_cache(settings.PREFETCH_CACHE).get(key)
+    if rows is None:
+        return None
+    return Page(rows, number, paginator)
+
+
+def remember_next_page(request, paginator, page, page_suffix):
+    """
+    Remembers the page following page on request, for
+    ``NextPagePrefetchMiddleware`` to prefetch. Only the pages of paginators
+    counting first are, as telling whether the others have a next page may
+    take a count of its own.
+    """
+    if not counts_first(paginator) or not page.has_next():
+        return
+    next_pages = getattr(request, 'pagination_next_pages', None)
+    if next_pages is None:
+        next_pages = request.pagination_next_pages = []
+    next_pages.append((page_url(request, page_suffix, page.number + 1), paginator, page.number + 1))
+
+
+def prefetch_page(paginator, number):
+    """
+    Fetches the rows of the page number of paginator into the cache, unless
+    they are already there.
+    """
+    if not counts_first(paginator):
+        return
+    try:
+        number, rows = page_slice(paginator, number)
+        key = page_cache_key(rows)
+        cache = get_cache(settings.PREFETCH_CACHE)
+        if key is None or key in cache:
+            return
+        cache.set(key, list(rows), settings.PREFETCH_TIMEOUT)
+    except Exception:
+        logger.exception("Could not prefetch page %d", number)
+
+
+class Prefetcher(object):
+    """
+    Pool of threads prefetching pages.
+
+    At most twice as many pages as there are threads wait to be prefetched,
+    the others are dropped rather than queued while the database is slow.
+    Without threads, pages are prefetched before returning, which only suits
+    tests.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pending = 0
+
+    def submit(self, paginator, number):
+        """
+        Prefetches the page number of paginator. Returns False if it was
+        dropped.
+        """
+        workers = settings.PREFETCH_WORKERS
+        if not workers:
+            prefetch_page(paginator, number)
+            return True
+        if ThreadPoolExecutor is None:
+            return False
+        with self.lock:
+            if self.pending >= 2 * workers:
+                return False
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=workers)
+            self.pending += 1
+        self.executor.submit(self.run, paginator, number)
+        return True
+
+    def run(self, paginator, number):
+        try:
+            _reusing_connections(prefetch_page)(paginator, number)
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+
+prefetcher = Prefetcher()
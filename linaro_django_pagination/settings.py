@@ -54,3 +54,69 @@ DISPLAY_DISABLED_NEXT_LINK = getattr(
     settings, 'PAGINATION_DISPLAY_DISABLED_NEXT_LINK', False)
 DISABLE_LINK_FOR_FIRST_PAGE = getattr(
     settings, 'PAGINATION_DISABLE_LINK_FOR_FIRST_PAGE', True)
+REVERSE_TAIL_PAGES = getattr(
+    settings, 'PAGINATION_REVERSE_TAIL_PAGES', True)
+WINDOW_COUNT = getattr(
+    settings, 'PAGINATION_WINDOW_COUNT', False)
+LAZY_COUNT = getattr(
+    settings, 'PAGINATION_LAZY_COUNT', False)
+COUNT_DATABASE = getattr(
+    settings, 'PAGINATION_COUNT_DATABASE', None)
+PAGE_DATABASE = getattr(
+    settings, 'PAGINATION_PAGE_DATABASE', None)
+COUNT_TIMEOUT = getattr(
+    settings, 'PAGINATION_COUNT_TIMEOUT', None)
+DEFAULT_PAGINATOR = getattr(
+    settings, 'PAGINATION_DEFAULT_PAGINATOR', None)
+PAGINATOR_CLASSES = getattr(
+    settings, 'PAGINATION_PAGINATOR_CLASSES', {})
+COLLECT_STATS = getattr(
+    settings, 'PAGINATION_COLLECT_STATS', False)
+STATS_CACHE = getattr(
+    settings, 'PAGINATION_STATS_CACHE', 'default')
+STATS_FLUSH_INTERVAL = getattr(
+    settings, 'PAGINATION_STATS_FLUSH_INTERVAL', 60)
+STATS_MAX_LISTINGS = getattr(
+    settings, 'PAGINATION_STATS_MAX_LISTINGS', 200)
+SLOW_LOG_TIME = getattr(
+    settings, 'PAGINATION_SLOW_LOG_TIME', None)
+SLOW_LOG_OFFSET = getattr(
+    settings, 'PAGINATION_SLOW_LOG_OFFSET', None)
+SLOW_LOG_RATE = getattr(
+    settings, 'PAGINATION_SLOW_LOG_RATE', 10)
+QUERY_BUDGET = getattr(
+    settings, 'PAGINATION_QUERY_BUDGET', None)
+QUERY_BUDGET_RAISE = getattr(
+    settings, 'PAGINATION_QUERY_BUDGET_RAISE', False)
+PARTIAL_HEADER = getattr(
+    settings, 'PAGINATION_PARTIAL_HEADER', 'HX-Request')
+STREAM_PER_PAGE = getattr(
+    settings, 'PAGINATION_STREAM_PER_PAGE', None)
+STREAM_CHUNK_SIZE = getattr(
+    settings, 'PAGINATION_STREAM_CHUNK_SIZE', 2000)
+COUNT_CACHE = getattr(
+    settings, 'PAGINATION_COUNT_CACHE', None)
+COUNT_CACHE_TIMEOUT = getattr(
+    settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 300)
+WARM_UP = getattr(
+    settings, 'PAGINATION_WARM_UP', ())
+DEEP_PAGE = getattr(
+    settings, 'PAGINATION_DEEP_PAGE', 10)
+DEEP_BUDGET = getattr(
+    settings, 'PAGINATION_DEEP_BUDGET', 60)
+DEEP_BUDGET_WINDOW = getattr(
+    settings, 'PAGINATION_DEEP_BUDGET_WINDOW', 60)
+DEEP_BUDGET_CACHE = getattr(
+    settings, 'PAGINATION_DEEP_BUDGET_CACHE', 'default')
+DEEP_BUDGET_ACTION = getattr(
+    settings, 'PAGINATION_DEEP_BUDGET_ACTION', 'reject')
+PREFETCH_NEXT = getattr(
+    settings, 'PAGINATION_PREFETCH_NEXT', False)
+PREFETCH_CACHE = getattr(
+    settings, 'PAGINATION_PREFETCH_CACHE', 'default')
+PREFETCH_TIMEOUT = getattr(
+    settings, 'PAGINATION_PREFETCH_TIMEOUT', 60)
+PREFETCH_WORKERS = getattr(
+    settings, 'PAGINATION_PREFETCH_WORKERS', 2)
+MERGE_WORKERS = getattr(
+    settings, 'PAGINATION_MERGE_WORKERS', 8)
@@ -0,0 +1,62 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Signals sent while paginating, for instrumentation.
+
+``paginated``
+    Sent by ``{% autopaginate %}`` once the current page is known. Arguments:
+    ``paginator``, ``page``, ``request``, ``page_suffix``, ``offset``,
+    ``per_page``, ``count_time`` and ``page_time`` (seconds, ``count_time`` is
+    None when the paginator did not count on its own), ``queries`` (the
+    number of database queries run) and ``sql`` (the list of their SQL).
+
+``pagination_rendered``
+    Sent by ``{% paginate %}``, and ``paginate()`` in Jinja2 templates, after
+    rendering the control. Arguments: ``request``, ``page_suffix``,
+    ``template``, ``render_time`` (seconds) and ``queries``. Controls
+    repeated for the same list in a request are only rendered, and sent,
+    once.
+
+``paginator_counted``
+    Sent by ``SimpleCountPaginator`` and its subclasses after counting a
+    queryset. Arguments: ``paginator``, ``count``, ``count_time`` (seconds)
+    and ``using``.
+
+Measuring the queries and the time needed to fetch the page only happens when
+a signal has receivers or a query budget is set. The rows of the page are then fetched by
+``{% autopaginate %}`` itself instead of by the template iterating over them.
+"""
+
+from django.dispatch import Signal
+
+
+paginated = Signal()
+pagination_rendered = Signal()
+paginator_counted = Signal()
@@ -0,0 +1,127 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Log of slow and deep pagination.
+
+Listens to the ``paginated`` signal and logs, to the
+``linaro_django_pagination.slow`` logger, the pages whose count or fetch took
+longer than ``PAGINATION_SLOW_LOG_TIME`` seconds or whose offset is beyond
+``PAGINATION_SLOW_LOG_OFFSET``. Each entry carries the request path, the page
+suffix, the offset, the timings and the SQL of the queries, both in the
+message and as a ``pagination`` attribute of the log record.
+
+At most ``PAGINATION_SLOW_LOG_RATE`` entries are logged per minute and
+process. The number of entries left out is reported with the next one.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from linaro_django_pagination import settings, signals
+
+
+logger = logging.getLogger('linaro_django_pagination.slow')
+
+
+class SlowPaginationLog(object):
+    """
+    Logs the pages that are slow to paginate or deep in their listing.
+    """
+
+    def __init__(self, time_threshold=None, offset_threshold=None, rate=None):
+        if time_threshold is None:
+            time_threshold = settings.SLOW_LOG_TIME
+        if offset_threshold is None:
+            offset_threshold = settings.SLOW_LOG_OFFSET
+        if rate is None:
+            rate = settings.SLOW_LOG_RATE
+        self.time_threshold = time_threshold
+        self.offset_threshold = offset_threshold
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.logged = deque()
+        self.suppressed = 0
+
+    def connect(self):
+        signals.paginated.connect(self.record, dispatch_uid='pagination_slow_log')
+
+    def disconnect(self):
+        signals.paginated.disconnect(dispatch_uid='pagination_slow_log')
+
+    def is_slow(self, count_time, page_time, offset):
+        if self.time_threshold is not None and max(count_time or 0, page_time or 0) > self.time_threshold:
+            return True
+        return self.offset_threshold is not None and offset > self.offset_threshold
+
+    def allow(self):
+        """
+        Checks whether another entry may be logged in the current minute.
+        """
+        now = time.time()
+        with self.lock:
+            while self.logged and self.logged[0] < now - 60:
+                self.logged.popleft()
+            if len(self.logged) >= self.rate:
+                self.suppressed += 1
+                return None
+            self.logged.append(now)
+            suppressed, self.suppressed = self.suppressed, 0
+            return suppressed
+
+    def record(self, sender, request=None, page_suffix='', offset=0, per_page=None, count_time=None,
+               page_time=None, queries=None, sql=(), **kwargs):
+        if not self.is_slow(count_time, page_time, offset):
+            return
+        suppressed = self.allow()
+        if suppressed is None:
+            return
+        entry = {
+            'path': getattr(request, 'path', None),
+            'page_suffix': page_suffix,
+            'offset': offset,
+            'per_page': per_page,
+            'paginator': sender.__name__,
+            'count_time': count_time,
+            'page_time': page_time,
+            'queries': queries,
+            'sql': list(sql),
+            'suppressed': suppressed,
+        }
+        logger.warning(
+            "Slow pagination of %s (page%s, offset %d, %s): count %s, page %.3fs, %s queries, "
+            "%d entries suppressed\n%s",
+            entry['path'], page_suffix, offset, entry['paginator'],
+            'n/a' if count_time is None else '%.3fs' % count_time, page_time or 0, queries, suppressed,
+            '\n'.join(entry['sql']), extra={'pagination': entry})
+
+
+slow_log = SlowPaginationLog()
@@ -0,0 +1,226 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+In-process collector of pagination statistics.
+
+The collector listens to the signals in ``linaro_django_pagination.signals``
+and keeps, for every listing (URL pattern name and page parameter), histograms
+of the time spent counting, fetching the page and rendering the control, of
+the queries run and of the page depth. It is enabled by the
+``PAGINATION_COLLECT_STATS`` setting. Listings beyond
+``PAGINATION_STATS_MAX_LISTINGS`` are counted together as ``OTHER``.
+
+Every ``PAGINATION_STATS_FLUSH_INTERVAL`` seconds the histograms of the process
+are added to the ones kept in the ``PAGINATION_STATS_CACHE`` cache, so that
+the ``pagination_stats`` management command can print the statistics of all
+processes sharing that cache.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+from linaro_django_pagination import settings, signals
+from linaro_django_pagination.paginator import get_cache
+
+
+CACHE_KEY = 'linaro_django_pagination.stats'
+
+# Listing of the statistics of listings past the limit
+OTHER = '(other)'
+
+# Upper bounds of the histogram buckets, the last bucket has no bound
+BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000)
+
+# Histograms kept for every listing with the unit of their values
+METRICS = (
+    ('count_time', 'ms'),
+    ('page_time', 'ms'),
+    ('render_time', 'ms'),
+    ('queries', ''),
+    ('page', ''),
+)
+
+
+class Histogram(object):
+    """
+    Counts values in buckets bounded by BOUNDS.
+    """
+
+    def __init__(self, counts=None, total=0, maximum=0):
+        self.counts = list(counts or [0] * (len(BOUNDS) + 1))
+        self.total = total
+        self.maximum = maximum
+
+    def add(self, value):
+        self.counts[bisect_left(BOUNDS, value)] += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def samples(self):
+        return sum(self.counts)
+
+    def percentile(self, percent):
+        """
+        Returns the upper bound of the bucket holding the given percentile.
+        """
+        threshold = self.samples * percent / 100.0
+        seen = 0
+        for bound, count in zip(BOUNDS, self.counts):
+            seen += count
+            if count and seen >= threshold:
+                return bound
+        return self.maximum
+
+    def to_dict(self):
+        return {'counts': self.counts, 'total': self.total, 'maximum': self.maximum}
+
+
+class PaginationStats(object):
+    """
+    Aggregates the pagination signals into histograms per listing.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.listings = {}
+        self.flushed = time.time()
+
+    def connect(self):
+        signals.paginated.connect(self.record_paginated, dispatch_uid='pagination_stats')
+        signals.pagination_rendered.connect(self.record_rendered, dispatch_uid='pagination_stats')
+
+    def disconnect(self):
+        signals.paginated.disconnect(dispatch_uid='pagination_stats')
+        signals.pagination_rendered.disconnect(dispatch_uid='pagination_stats')
+
+    def record(self, request, page_suffix, **values):
+        listing = '%s?page%s' % (get_listing_name(request), page_suffix)
+        with self.lock:
+            if listing not in self.listings and len(self.listings) >= settings.STATS_MAX_LISTINGS:
+                listing = OTHER
+            histograms = self.listings.setdefault(listing, {})
+            for metric, value in values.items():
+                if value is not None:
+                    histograms.setdefault(metric, Histogram()).add(value)
+        if time.time() - self.flushed > settings.STATS_FLUSH_INTERVAL:
+            self.flush()
+
+    def record_paginated(self, sender, request=None, page_suffix='', page=None, count_time=None,
+                         page_time=None, queries=None, **kwargs):
+        self.record(request, page_suffix, page=page.number, queries=queries,
+                    count_time=None if count_time is None else count_time * 1000,
+                    page_time=None if page_time is None else page_time * 1000)
+
+    def record_rendered(self, sender, request=None, page_suffix='', render_time=None, queries=None, **kwargs):
+        self.record(request, page_suffix, render_time=render_time * 1000, queries=queries)
+
+    def snapshot(self):
+        """
+        Returns the histograms as a dictionary of plain values.
+        """
+        with self.lock:
+            return dict(
+                (listing, dict((metric, histogram.to_dict()) for metric, histogram in histograms.items()))
+                for listing, histograms in self.listings.items())
+
+    def reset(self):
+        with self.lock:
+            self.listings = {}
+
+    def flush(self):
+        """
+        Adds the histograms of this process to the ones in the cache.
+        """
+        with self.lock:
+            listings, self.listings = self.listings, {}
+            self.flushed = time.time()
+        cache = get_cache(settings.STATS_CACHE)
+        # Concurrent flushes from other processes may be lost, these are
+        # statistics and not accounting
+        cache.set(CACHE_KEY, merge_snapshots(cache.get(CACHE_KEY, {}), listings, settings.STATS_MAX_LISTINGS),
+                  None)
+
+    def load(self):
+        """
+        Returns the histograms in the cache combined with those of this process.
+        """
+        cached = get_cache(settings.STATS_CACHE).get(CACHE_KEY, {})
+        with self.lock:
+            return merge_snapshots(cached, self.listings)
+
+    def clear(self):
+        """
+        Forgets the histograms of this process and those in the cache.
+        """
+        self.reset()
+        get_cache(settings.STATS_CACHE).delete(CACHE_KEY)
+
+
+def get_listing_name(request):
+    """
+    Returns the name of the URL pattern request matched, or its path when it
+    did not go through URL resolution.
+    """
+    resolver_match = getattr(request, 'resolver_match', None)
+    if resolver_match is not None:
+        return resolver_match.view_name
+    return getattr(request, 'path', '')
+
+
+def merge_snapshots(snapshot, listings, max_listings=None):
+    """
+    Returns snapshot, a dictionary made by PaginationStats.snapshot(), with the
+    Histogram objects in listings added to it. Listings past max_listings are
+    added to OTHER.
+    """
+    merged = {}
+    for listing, histograms in snapshot.items():
+        merged[listing] = dict((metric, Histogram(**values)) for metric, values in histograms.items())
+    for listing, histograms in listings.items():
+        if listing not in merged and max_listings is not None and len(merged) >= max_listings:
+            listing = OTHER
+        target = merged.setdefault(listing, {})
+        for metric, histogram in histograms.items():
+            if not isinstance(histogram, Histogram):
+                histogram = Histogram(**histogram)
+            target.setdefault(metric, Histogram()).merge(histogram)
+    return dict(
+        (listing, dict((metric, histogram.to_dict()) for metric, histogram in histograms.items()))
+        for listing, histograms in merged.items())
+
+
+collector = PaginationStats()
@@ -29,18 +29,26 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
+from copy import copy
+from timeit import default_timer
+from weakref import WeakKeyDictionary
+
 from django.conf import settings as django_settings
 from django.core.exceptions import ImproperlyConfigured
-from django.core.paginator import Paginator, InvalidPage
+from django.core.paginator import InvalidPage, Page
 from django.http import Http404
 from django.template import (
     Library,
     Node,
+    NodeList,
+    TemplateDoesNotExist,
     TemplateSyntaxError,
     Variable,
     loader,
 )
 
+from django.template.loader_tags import BlockNode, ExtendsNode
+
 try:
     from django.template.base import TOKEN_BLOCK
 except ImportError:     # Django < 1.8
@@ -48,7 +56,174 @@ except ImportError:     # Django < 1.8
 
 from django.utils.text import unescape_string_literal
 
-from linaro_django_pagination import settings
+try:
+    from django.utils.module_loading import import_string
+except ImportError:     # Django < 1.7
+    from django.utils.module_loading import import_by_path as import_string
+
+from linaro_django_pagination import settings, signals
+from linaro_django_pagination.instrumentation import QueryCounter, check_query_budget, get_query_budget
+from linaro_django_pagination.prefetch import page_slice, prefetchable, prefetched_page, remember_next_page
+from linaro_django_pagination.paginator import (
+    CountTimeout,
+    FinitePaginator,
+    InfinitePaginator,
+    LazyCountPaginator,
+    MergePaginator,
+    RemotePaginator,
+    ReversingPaginator,
+    SimpleCountPaginator,
+    WindowCountPaginator,
+    stream_page,
+)
+
+
+PAGINATOR_CLASSES = {
+    'simple': SimpleCountPaginator,
+    'reversing': ReversingPaginator,
+    'window_count': WindowCountPaginator,
+    'lazy_count': LazyCountPaginator,
+    'infinite': InfinitePaginator,
+    'finite': FinitePaginator,
+    'merge': MergePaginator,
+    'remote': RemotePaginator,
+}
+
+CONTROL_TEMPLATES = ('pagination/pagination.html', 'pagination/next.html')
+
+
+def get_paginator_class(name=None):
+    """
+    Returns the paginator class registered under name, or imported from name
+    if it is a dotted path. Classes are returned as they are.
+
+    Without a name the class is chosen by the PAGINATION_DEFAULT_PAGINATOR
+    setting, or by the WINDOW_COUNT, LAZY_COUNT and REVERSE_TAIL_PAGES
+    settings when that is not set.
+    """
+    if isinstance(name, type):
+        return name
+    if name is None:
+        name = settings.DEFAULT_PAGINATOR
+    if name is None:
+        if settings.WINDOW_COUNT:
+            return WindowCountPaginator
+        elif settings.LAZY_COUNT:
+            return LazyCountPaginator
+        elif settings.REVERSE_TAIL_PAGES:
+            return ReversingPaginator
+        return SimpleCountPaginator
+    paginator_class = settings.PAGINATOR_CLASSES.get(name, PAGINATOR_CLASSES.get(name))
+    if paginator_class is None:
+        if '.' not in name:
+            raise ImproperlyConfigured("Unknown paginator %r. Use one of %s or a dotted path." % (
+                name, ", ".join(sorted(set(PAGINATOR_CLASSES) | set(settings.PAGINATOR_CLASSES)))))
+        paginator_class = name
+    if not isinstance(paginator_class, type):
+        paginator_class = import_string(paginator_class)
+    return paginator_class
+
+
+def choose_paginator_class(request, name=None, partial=False):
+    """
+    Returns the class of the paginator of a list displayed for request: an
+    InfinitePaginator for partial renders, which only link to the next page,
+    and for clients over the budget of ``DeepPaginationBudgetMiddleware``,
+    else the class get_paginator_class returns for name.
+    """
+    if partial or getattr(request, 'pagination_count_free', False):
+        return InfinitePaginator
+    return get_paginator_class(name)
+
+
+def get_paginator(paginator_class, object_list, per_page, orphans):
+    """
+    Creates a paginator of paginator_class with the arguments it understands.
+    """
+    if issubclass(paginator_class, SimpleCountPaginator):
+        return paginator_class(object_list, per_page, orphans,
+                               count_using=settings.COUNT_DATABASE,
+                               page_using=settings.PAGE_DATABASE,
+                               count_timeout=settings.COUNT_TIMEOUT,
+                               count_cache=settings.COUNT_CACHE,
+                               count_cache_timeout=settings.COUNT_CACHE_TIMEOUT)
+    elif issubclass(paginator_class, InfinitePaginator):
+        # Infinite pagination has no orphans
+        return paginator_class(object_list, per_page)
+    return paginator_class(object_list, per_page, orphans)
+
+
+def get_page(paginator, number, prefetched=False):
+    """
+    Returns the paginator and the page to display, which comes from an
+    InfinitePaginator when counting took too long. With prefetched, the page
+    is taken from the prefetch cache when it is there.
+    """
+    try:
+        page_obj = prefetched_page(paginator, number) if prefetched else None
+        if page_obj is None:
+            page_obj = paginator.page(number)
+        if settings.COUNT_TIMEOUT is not None:
+            # Count now so that a timeout cannot surface in paginate
+            paginator.count
+    except CountTimeout:
+        # Carry on without the count, with previous/next links only
+        paginator = InfinitePaginator(paginator.object_list, paginator.per_page)
+        page_obj = paginator.page(number)
+    return paginator, page_obj
+
+
+def get_streamed_page(paginator, number):
+    """
+    Returns the paginator and the page to stream. Paginators counting a
+    queryset get a plain slice of it, since the pages they fetch reversed or
+    along with their count are lists.
+    """
+    if not prefetchable(paginator):
+        return get_page(paginator, number)
+    try:
+        number, rows = page_slice(paginator, number)
+    except CountTimeout:
+        # Counting again would only time out again
+        paginator = InfinitePaginator(paginator.object_list, paginator.per_page)
+        return paginator, paginator.page(number)
+    return paginator, Page(rows, number, paginator)
+
+
+def paginate_list(paginator, request, page_suffix, fields=None):
+    """
+    Returns the paginator and the page of it requested by request, sending the
+    ``paginated`` signal. Raises InvalidPage for pages out of range.
+
+    Pages of at least ``PAGINATION_STREAM_PER_PAGE`` objects load them in
+    chunks, as dictionaries of the given fields if any. Smaller pages are
+    taken from the cache when prefetched with ``PAGINATION_PREFETCH_NEXT``.
+    """
+    stream = settings.STREAM_PER_PAGE is not None and paginator.per_page >= settings.STREAM_PER_PAGE
+    instrumented = signals.paginated.has_listeners() or get_query_budget('autopaginate') is not None
+    with QueryCounter(instrumented) as queries:
+        started = default_timer()
+        if stream:
+            paginator, page_obj = get_streamed_page(paginator, request.page(page_suffix))
+            stream_page(page_obj, settings.STREAM_CHUNK_SIZE, fields)
+        else:
+            paginator, page_obj = get_page(paginator, request.page(page_suffix), settings.PREFETCH_NEXT)
+        if instrumented and not stream:
+            # Fetch the page here so that it is timed as well
+            page_obj.object_list = list(page_obj.object_list)
+        elapsed = default_timer() - started
+    if instrumented:
+        check_query_budget('autopaginate', page_suffix, queries)
+        count_time = getattr(paginator, 'count_time', None)
+        signals.paginated.send(
+            sender=paginator.__class__, paginator=paginator, page=page_obj, request=request,
+            page_suffix=page_suffix, offset=(page_obj.number - 1) * paginator.per_page,
+            per_page=paginator.per_page, count_time=count_time,
+            page_time=elapsed - (count_time or 0), queries=queries.count, sql=queries.sql)
+    if settings.PREFETCH_NEXT and not stream:
+        # Streamed pages are too large to be worth keeping in a cache
+        remember_next_page(request, paginator, page_obj, page_suffix)
+    return paginator, page_obj
 
 
 def do_autopaginate(parser, token):
@@ -57,7 +232,10 @@ def do_autopaginate(parser, token):
 
     Syntax is:
 
-        autopaginate QUERYSET [PAGINATE_BY] [ORPHANS] [as NAME]
+        autopaginate QUERYSET [PAGINATE_BY] [ORPHANS] [using "PAGINATOR"] [as NAME]
+
+    Where PAGINATOR is a quoted paginator name, such as "infinite", or a dotted
+    path to a paginator class. If missing the default paginator is used.
     """
     # Check whether there are any other autopaginations are later in this template
     expr = lambda obj: (obj.token_type == TOKEN_BLOCK and len(obj.split_contents()) > 0 and
@@ -69,35 +247,46 @@ def do_autopaginate(parser, token):
     queryset_var = None
     context_var = None
     orphans = None
+    paginator_class = None
     try:
         word = next(i)
         assert word == "autopaginate"
         queryset_var = next(i)
         word = next(i)
-        if word != "as":
+        if word not in ("as", "using"):
             paginate_by = word
             try:
                 paginate_by = int(paginate_by)
             except ValueError:
                 pass
             word = next(i)
-        if word != "as":
+        if word not in ("as", "using"):
             orphans = word
             try:
                 orphans = int(orphans)
             except ValueError:
                 pass
             word = next(i)
+        if word == "using":
+            paginator_class = next(i, "")
+            word = next(i)
         assert word == "as"
         context_var = next(i)
     except StopIteration:
         pass
+    syntax_error = TemplateSyntaxError(
+        "Invalid syntax. Proper usage of this tag is: "
+        "{% autopaginate QUERYSET [PAGINATE_BY] [ORPHANS]"
+        " [using \"PAGINATOR\"] [as CONTEXT_VAR_NAME] %}")
     if queryset_var is None:
-        raise TemplateSyntaxError(
-            "Invalid syntax. Proper usage of this tag is: "
-            "{% autopaginate QUERYSET [PAGINATE_BY] [ORPHANS]"
-            " [as CONTEXT_VAR_NAME] %}")
-    return AutoPaginateNode(queryset_var, multiple_paginations, paginate_by, orphans, context_var)
+        raise syntax_error
+    if paginator_class is not None:
+        try:
+            paginator_class = unescape_string_literal(paginator_class)
+        except (IndexError, ValueError):
+            raise syntax_error
+    return AutoPaginateNode(queryset_var, multiple_paginations, paginate_by, orphans, context_var,
+                            paginator_class)
 
 
 class AutoPaginateNode(Node):
@@ -118,7 +307,7 @@ class AutoPaginateNode(Node):
         list of available pages, or else the application may seem to be buggy.
     """
     def __init__(self, queryset_var, multiple_paginations, paginate_by=None,
-                 orphans=None, context_var=None):
+                 orphans=None, context_var=None, paginator_class=None):
         if paginate_by is None:
             paginate_by = settings.DEFAULT_PAGINATION
         if orphans is None:
@@ -134,6 +323,7 @@ class AutoPaginateNode(Node):
             self.orphans = Variable(orphans)
         self.context_var = context_var
         self.multiple_paginations = multiple_paginations
+        self.paginator_class = paginator_class
 
     def render(self, context):
         # Save multiple_paginations state in context
@@ -147,6 +337,12 @@ class AutoPaginateNode(Node):
 
         key = self.queryset_var.var
         value = self.queryset_var.resolve(context)
+        page_obj = context.get('page_obj')
+        if page_obj is not None and page_obj.object_list is value:
+            # The view already paginated the list, see PaginationMixin
+            if self.context_var is not None:
+                context[self.context_var] = value
+            return ''
         if isinstance(self.paginate_by, int):
             paginate_by = self.paginate_by
         else:
@@ -155,15 +351,16 @@ class AutoPaginateNode(Node):
             orphans = self.orphans
         else:
             orphans = self.orphans.resolve(context)
-        paginator = Paginator(value, paginate_by, orphans)
         try:
             request = context['request']
         except KeyError:
             raise ImproperlyConfigured(
                 "You need to enable 'django.core.context_processors.request'."
                 " See linaro-django-pagination/README file for TEMPLATE_CONTEXT_PROCESSORS details")
+        paginator_class = choose_paginator_class(request, self.paginator_class, context.get('pagination_partial'))
+        paginator = get_paginator(paginator_class, value, paginate_by, orphans)
         try:
-            page_obj = paginator.page(request.page(page_suffix))
+            paginator, page_obj = paginate_list(paginator, request, page_suffix)
         except InvalidPage:
             if settings.INVALID_PAGE_RAISES_404:
                 raise Http404('Invalid page requested.  If DEBUG were set to ' +
@@ -185,13 +382,110 @@ class PaginateNode(Node):
 
     def __init__(self, template=None):
         self.template = template
+        # Control templates resolved by the first render, by partial mode
+        self.templates = {}
+
+    def get_template(self, context, partial):
+        """
+        Returns the control template, only resolved on the first render unless
+        DEBUG is on, where templates may change between renders.
+        """
+        template = self.templates.get(partial)
+        if template is None or django_settings.DEBUG:
+            if partial:
+                template_list = ['pagination/next.html']
+            else:
+                template_list = ['pagination/pagination.html']
+                if self.template:
+                    template_list.insert(0, self.template)
+            template = select_template(context, template_list)
+            self.templates[partial] = template
+        return template
 
     def render(self, context):
-        template_list = ['pagination/pagination.html']
-        new_context = paginate(context)
-        if self.template:
-            template_list.insert(0, self.template)
-        return loader.render_to_string(template_list, new_context, context_instance=context)
+        partial = bool(context.get('pagination_partial'))
+        key = ('django', context.get('page_suffix', ''), self.template, partial)
+        content = get_rendered_control(context.get('request'), key, context.get('page_obj'))
+        if content is not None:
+            return content
+        instrumented = signals.pagination_rendered.has_listeners() or get_query_budget('paginate') is not None
+        with QueryCounter(instrumented) as queries:
+            started = default_timer()
+            new_context = paginate(context)
+            template = self.get_template(context, partial)
+            context.update(new_context)
+            try:
+                content = template.render(context)
+            finally:
+                context.pop()
+            elapsed = default_timer() - started
+        set_rendered_control(context.get('request'), key, context.get('page_obj'), content)
+        if instrumented:
+            check_query_budget('paginate', context.get('page_suffix', ''), queries)
+            signals.pagination_rendered.send(
+                sender=self.__class__, request=context.get('request'),
+                page_suffix=context.get('page_suffix', ''), template=self.template,
+                render_time=elapsed, queries=queries.count)
+        return content
+
+
+def get_rendered_control(request, key, page_obj):
+    """
+    Returns the control rendered earlier in the request for page_obj with
+    key, or None.
+    """
+    controls = getattr(request, 'pagination_controls', None)
+    if not controls or key not in controls:
+        return None
+    rendered_page_obj, content = controls[key]
+    if rendered_page_obj is not page_obj:
+        # Another list paginated with the same suffix
+        return None
+    return content
+
+
+def set_rendered_control(request, key, page_obj, content):
+    """
+    Keeps the control rendered for page_obj with key until the end of the
+    request, for the controls repeated around a list to be rendered once.
+    """
+    if request is None or page_obj is None:
+        return
+    controls = getattr(request, 'pagination_controls', None)
+    if controls is None:
+        controls = request.pagination_controls = {}
+    controls[key] = (page_obj, content)
+
+
+def select_template(context, template_list):
+    """
+    Returns the first template of template_list found by the engine rendering
+    context, as a template rendering a Context.
+    """
+    engine = getattr(getattr(context, 'template', None), 'engine', None)
+    if engine is not None:
+        return engine.select_template(template_list)
+    template = loader.select_template(template_list)
+    # Django >= 1.8 wraps templates for its template backends
+    return getattr(template, 'template', template)
+
+
+def warm_up_templates():
+    """
+    Loads the default control templates with every template engine, for
+    those caching compiled templates to have them before the first request.
+    """
+    try:
+        from django.template import engines
+    except ImportError:     # Django < 1.8
+        return
+    for engine in engines.all():
+        for name in CONTROL_TEMPLATES:
+            try:
+                engine.get_template(name)
+            except (TemplateDoesNotExist, TemplateSyntaxError):
+                # Not a template of this engine
+                pass
 
 
 def do_paginate(parser, token):
@@ -218,6 +512,183 @@ def do_paginate(parser, token):
     return PaginateNode(template)
 
 
+class PageOfNode(Node):
+    """
+    Emits the query string of the page of a list an object is on.
+    """
+    def __init__(self, object_var, queryset_var, paginate_by=None, orphans=None, page_suffix='',
+                 context_var=None):
+        if paginate_by is None:
+            paginate_by = settings.DEFAULT_PAGINATION
+        if orphans is None:
+            orphans = settings.DEFAULT_ORPHANS
+        self.object_var = Variable(object_var)
+        self.queryset_var = Variable(queryset_var)
+        self.paginate_by = paginate_by if isinstance(paginate_by, int) else Variable(paginate_by)
+        self.orphans = orphans if isinstance(orphans, int) else Variable(orphans)
+        self.page_suffix = page_suffix
+        self.context_var = context_var
+
+    def render(self, context):
+        paginate_by = self.paginate_by
+        if not isinstance(paginate_by, int):
+            paginate_by = paginate_by.resolve(context)
+        orphans = self.orphans
+        if not isinstance(orphans, int):
+            orphans = orphans.resolve(context)
+        paginator = get_paginator(SimpleCountPaginator, self.queryset_var.resolve(context),
+                                  paginate_by, orphans)
+        try:
+            link = '?page%s=%d' % (self.page_suffix, paginator.page_of(self.object_var.resolve(context)))
+        except ValueError:
+            # Orderings by relations, NULL values and sliced querysets cannot
+            # be ranked, leaving the URL of the listing as it is
+            link = ''
+        if self.context_var is not None:
+            context[self.context_var] = link
+            return ''
+        return link
+
+
+def do_page_of(parser, token):
+    """
+    Emits the query string of the page of QUERYSET that OBJECT is on, such as
+    ``?page=3``, paginated as autopaginate would.
+
+    Syntax is:
+
+        page_of OBJECT in QUERYSET [PAGINATE_BY] [ORPHANS] [suffix "SUFFIX"] [as NAME]
+
+    Where SUFFIX is the quoted page suffix of the listing, such as "_items".
+    """
+    bits = token.split_contents()
+    syntax_error = TemplateSyntaxError(
+        "Invalid syntax. Proper usage of this tag is: "
+        "{% page_of OBJECT in QUERYSET [PAGINATE_BY] [ORPHANS]"
+        " [suffix \"SUFFIX\"] [as CONTEXT_VAR_NAME] %}")
+    if len(bits) < 4 or bits[2] != 'in':
+        raise syntax_error
+    object_var, queryset_var = bits[1], bits[3]
+    context_var = None
+    page_suffix = ''
+    bits = bits[4:]
+    if len(bits) >= 2 and bits[-2] == 'as':
+        context_var = bits[-1]
+        bits = bits[:-2]
+    if len(bits) >= 2 and bits[-2] == 'suffix':
+        try:
+            page_suffix = unescape_string_literal(bits[-1])
+        except (IndexError, ValueError):
+            raise syntax_error
+        bits = bits[:-2]
+    if len(bits) > 2:
+        raise syntax_error
+    numbers = []
+    for bit in bits:
+        try:
+            numbers.append(int(bit))
+        except ValueError:
+            numbers.append(bit)
+    return PageOfNode(object_var, queryset_var, *numbers, page_suffix=page_suffix, context_var=context_var)
+
+
+class PartialNode(Node):
+    """
+    Marks the part of a template, usually the object list, rendered alone for
+    partial requests by ``get_partial_template``.
+    """
+    child_nodelists = ('nodelist',)
+
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        return self.nodelist.render(context)
+
+
+def do_paginate_partial(parser, token):
+    """
+    Marks the content rendered for partial requests, such as the next page of
+    an infinite scroll.
+
+    Syntax is:
+
+        paginate_partial
+            ...
+        endpaginate_partial
+    """
+    if len(token.split_contents()) != 1:
+        raise TemplateSyntaxError(
+            "Invalid syntax. Proper usage of this tag is: "
+            "{% paginate_partial %}...{% endpaginate_partial %}")
+    nodelist = parser.parse(('endpaginate_partial',))
+    parser.delete_first_token()
+    return PartialNode(nodelist)
+
+
+# Partial copies of the templates seen so far, None for those without
+# paginate_partial tags, kept as long as the templates
+_partial_templates = WeakKeyDictionary()
+
+
+def _top_level_nodes(nodelist):
+    """
+    Yields the nodes of nodelist and of the blocks in it, which render in the
+    context of the whole template.
+    """
+    for node in nodelist:
+        yield node
+        if isinstance(node, (BlockNode, ExtendsNode)):
+            for child in _top_level_nodes(node.nodelist):
+                yield child
+
+
+def get_partial_template(template):
+    """
+    Returns a copy of template rendering only its autopaginate tags, the
+    content of its paginate_partial tags and a link to the next page, or None
+    if the template has no paginate_partial tag or is not a Django template.
+    Copies are made once per template.
+
+    The copy must be rendered with ``pagination_partial`` set in the context,
+    which skips counting. As it renders these tags alone, they must not be
+    nested in other tags than blocks, which would set the variables they
+    use, else TemplateSyntaxError is raised. Autopaginate tags inside
+    paginate_partial may be nested in anything.
+    """
+    template = getattr(template, 'template', template)
+    if not hasattr(template, 'nodelist'):
+        # Only Django templates have paginate_partial tags
+        return None
+    if template not in _partial_templates:
+        _partial_templates[template] = _make_partial_template(template)
+    return _partial_templates[template]
+
+
+def _make_partial_template(template):
+    partials = template.nodelist.get_nodes_by_type(PartialNode)
+    if not partials:
+        return None
+    nested = set()
+    for partial in partials:
+        nested.update(id(node) for node in partial.nodelist.get_nodes_by_type(AutoPaginateNode))
+    autopaginates = [node for node in template.nodelist.get_nodes_by_type(AutoPaginateNode)
+                     if id(node) not in nested]
+    top_level = set(id(node) for node in _top_level_nodes(template.nodelist))
+    if any(id(node) not in top_level for node in partials + autopaginates):
+        raise TemplateSyntaxError(
+            "paginate_partial tags, and the autopaginate tags outside them, must not be nested in other "
+            "tags than blocks in %s, as they are rendered alone for partial requests." % (
+                template.name or "the template"))
+    nodelist = NodeList(autopaginates)
+    for partial in partials:
+        nodelist.extend(partial.nodelist)
+    nodelist.append(PaginateNode())
+    partial_template = copy(template)
+    partial_template.nodelist = nodelist
+    return partial_template
+
+
 def paginate(context, window=settings.DEFAULT_WINDOW, margin=settings.DEFAULT_MARGIN):
     """
     Renders the ``pagination/pagination.html`` template, resulting in a
@@ -229,7 +700,9 @@ def paginate(context, window=settings.DEFAULT_WINDOW, margin=settings.DEFAULT_MA
     structure and must contain the following keys:
 
     ``paginator``
-        A ``Paginator`` or ``QuerySetPaginator`` object.
+        A ``Paginator`` or ``QuerySetPaginator`` object. Paginators without a
+        count, such as ``InfinitePaginator``, only get links to the previous
+        and the next page.
 
     ``page_obj``
         This should be the result of calling the page method on the
@@ -262,49 +735,59 @@ def paginate(context, window=settings.DEFAULT_WINDOW, margin=settings.DEFAULT_MA
         paginator = context['paginator']
         page_obj = context['page_obj']
         page_suffix = context.get('page_suffix', '')
-        page_range = list(paginator.page_range)
-        # Calculate the record range in the current page for display.
-        records = {'first': 1 + (page_obj.number - 1) * paginator.per_page}
-        records['last'] = records['first'] + paginator.per_page - 1
-        if records['last'] + paginator.orphans >= paginator.count:
-            records['last'] = paginator.count
-
-        # figure window
-        window_start = page_obj.number - window - 1
-        window_end = page_obj.number + window
-
-        # solve if window exceeded page range
-        if window_start < 0:
-            window_end -= window_start
-            window_start = 0
-        if window_end > paginator.num_pages:
-            window_start = max(0, window_start - (window_end - paginator.num_pages))
-            window_end = paginator.num_pages
-        pages = page_range[window_start:window_end]
-
-        # figure margin and add elipses
-        if margin > 0:
-            # figure margin
-            tmp_pages = set(pages)
-            tmp_pages = tmp_pages.union(page_range[:margin])
-            tmp_pages = tmp_pages.union(page_range[-margin:])
-            tmp_pages = list(tmp_pages)
-            tmp_pages.sort()
+        try:
+            paginator.count
+        except NotImplementedError:
+            # Paginators without a count only know the neighbouring pages
             pages = []
-            pages.append(tmp_pages[0])
-            for i in range(1, len(tmp_pages)):
-                # figure gap size => add elipses or fill in gap
-                gap = tmp_pages[i] - tmp_pages[i - 1]
-                if gap >= 3:
-                    pages.append(None)
-                elif gap == 2:
-                    pages.append(tmp_pages[i] - 1)
-                pages.append(tmp_pages[i])
+            records = {'first': 1 + (page_obj.number - 1) * paginator.per_page,
+                       'last': page_obj.end_index()}
+            is_paginated = page_obj.has_other_pages()
         else:
-            if pages[0] != 1:
-                pages.insert(0, None)
-            if pages[-1] != paginator.num_pages:
-                pages.append(None)
+            is_paginated = paginator.count > paginator.per_page
+            page_range = list(paginator.page_range)
+            # Calculate the record range in the current page for display.
+            records = {'first': 1 + (page_obj.number - 1) * paginator.per_page}
+            records['last'] = records['first'] + paginator.per_page - 1
+            if records['last'] + paginator.orphans >= paginator.count:
+                records['last'] = paginator.count
+
+            # figure window
+            window_start = page_obj.number - window - 1
+            window_end = page_obj.number + window
+
+            # solve if window exceeded page range
+            if window_start < 0:
+                window_end -= window_start
+                window_start = 0
+            if window_end > paginator.num_pages:
+                window_start = max(0, window_start - (window_end - paginator.num_pages))
+                window_end = paginator.num_pages
+            pages = page_range[window_start:window_end]
+
+            # figure margin and add elipses
+            if margin > 0:
+                # figure margin
+                tmp_pages = set(pages)
+                tmp_pages = tmp_pages.union(page_range[:margin])
+                tmp_pages = tmp_pages.union(page_range[-margin:])
+                tmp_pages = list(tmp_pages)
+                tmp_pages.sort()
+                pages = []
+                pages.append(tmp_pages[0])
+                for i in range(1, len(tmp_pages)):
+                    # figure gap size => add elipses or fill in gap
+                    gap = tmp_pages[i] - tmp_pages[i - 1]
+                    if gap >= 3:
+                        pages.append(None)
+                    elif gap == 2:
+                        pages.append(tmp_pages[i] - 1)
+                    pages.append(tmp_pages[i])
+            else:
+                if pages[0] != 1:
+                    pages.insert(0, None)
+                if pages[-1] != paginator.num_pages:
+                    pages.append(None)
 
         new_context = {
             'MEDIA_URL': django_settings.MEDIA_URL,
@@ -313,7 +796,7 @@ def paginate(context, window=settings.DEFAULT_WINDOW, margin=settings.DEFAULT_MA
             'display_disabled_next_link': settings.DISPLAY_DISABLED_NEXT_LINK,
             'display_disabled_previous_link': settings.DISPLAY_DISABLED_PREVIOUS_LINK,
             'display_page_links': settings.DISPLAY_PAGE_LINKS,
-            'is_paginated': paginator.count > paginator.per_page,
+            'is_paginated': is_paginated,
             'next_link_decorator': settings.NEXT_LINK_DECORATOR,
             'page_obj': page_obj,
             'page_suffix': page_suffix,
@@ -338,3 +821,5 @@ def paginate(context, window=settings.DEFAULT_WINDOW, margin=settings.DEFAULT_MA
 register = Library()
 register.tag('paginate', do_paginate)
 register.tag('autopaginate', do_autopaginate)
+register.tag('paginate_partial', do_paginate_partial)
+register.tag('page_of', do_page_of)
@@ -0,0 +1,86 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import random
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from example.models import Category, Entry
+
+
+class Command(BaseCommand):
+    help = ("Fills the database with entries to paginate. Point the test project at a SQLite file "
+            "to keep them between runs.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=1000000,
+                            help="Number of entries to create, a million by default.")
+        parser.add_argument('--categories', type=int, default=50,
+                            help="Number of categories to spread the entries over.")
+        parser.add_argument('--batch-size', type=int, default=5000, dest='batch_size',
+                            help="Number of entries inserted per query.")
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Seed of the random values, for datasets that can be made again.")
+        parser.add_argument('--database', default='default',
+                            help="Alias of the database to fill.")
+        parser.add_argument('--clear', action='store_true', dest='clear',
+                            help="Delete the existing entries and categories first.")
+
+    def handle(self, *args, **options):
+        using = options['database']
+        rng = random.Random(options['seed'])
+        with transaction.atomic(using=using):
+            if options['clear']:
+                Entry.objects.using(using).all().delete()
+                Category.objects.using(using).all().delete()
+            Category.objects.using(using).bulk_create(
+                Category(name="Category %d" % number) for number in range(options['categories']))
+            category_ids = list(Category.objects.using(using).order_by('pk').values_list('pk', flat=True))
+            start = datetime(2010, 1, 1)
+            span = int(timedelta(days=10 * 365).total_seconds())
+            created = 0
+            while created < options['entries']:
+                batch = min(options['batch_size'], options['entries'] - created)
+                Entry.objects.using(using).bulk_create([
+                    Entry(
+                        # A few categories hold most entries, as they usually do
+                        category_id=category_ids[min(int(rng.expovariate(0.2)), len(category_ids) - 1)],
+                        title="Entry %d" % (created + number),
+                        published=start + timedelta(seconds=rng.randint(0, span)),
+                        score=rng.randint(0, 1000))
+                    for number in range(batch)])
+                created += batch
+                self.stdout.write("%d entries" % created)
+        connection = connections[using]
+        if connection.vendor == 'sqlite':
+            # Give the query planner statistics about the indexes
+            connection.cursor().execute('ANALYZE')
@@ -0,0 +1,124 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import math
+import random
+from collections import defaultdict
+from timeit import default_timer
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_started
+from django.db import reset_queries
+from django.test import Client
+
+from example.models import Category, Entry
+from linaro_django_pagination.instrumentation import QueryCounter
+
+
+# Share of the requests for each range of pages, the rest going to the tail
+DEPTHS = [
+    (0.6, 1, 5),
+    (0.25, 6, 100),
+    (0.1, 101, 1000),
+]
+
+
+def percentile(values, percent):
+    """
+    Returns the value below which the given percentage of values fall.
+    """
+    ordered = sorted(values)
+    return ordered[max(0, int(math.ceil(len(ordered) * percent / 100.0)) - 1)]
+
+
+class Command(BaseCommand):
+    help = ("Requests the entry listings of the example application at various depths and prints "
+            "the latency and number of queries of each. Run generate_entries first.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000,
+                            help="Number of requests to make.")
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Seed of the random choice of pages.")
+        parser.add_argument('--host', default='testserver',
+                            help="Host of the requests, which ALLOWED_HOSTS must allow.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        category = Category.objects.order_by('pk').first()
+        if category is None:
+            raise CommandError("There are no entries, run generate_entries first.")
+        total = Entry.objects.count()
+        in_category = Entry.objects.filter(category=category).count()
+        # Path, page parameters and number of pages of each listing
+        listings = [
+            ('/entries/', ['page'], total // 20 + 1),
+            ('/entries/%d/' % category.pk, ['page'], in_category // 20 + 1),
+            ('/two-entry-lists/', ['page_recent_entry_list', 'page_top_entry_list'], total // 10 + 1),
+        ]
+        client = Client(HTTP_HOST=options['host'])
+        results = defaultdict(list)
+        # Requests would forget their queries before they could be counted
+        request_started.disconnect(reset_queries)
+        try:
+            for number in range(options['requests']):
+                path, parameters, pages = rng.choice(listings)
+                data = dict((parameter, self.choose_page(rng, pages)) for parameter in parameters)
+                reset_queries()
+                started = default_timer()
+                with QueryCounter() as queries:
+                    response = client.get(path, data)
+                elapsed = default_timer() - started
+                results[path].append((elapsed * 1000, queries.count, response.status_code))
+        finally:
+            request_started.connect(reset_queries)
+        self.stdout.write("%-22s %6s %9s %9s %9s %8s %8s %6s" % (
+            "listing", "n", "p50 ms", "p95 ms", "p99 ms", "queries", "max q", "errors"))
+        for path, _, _ in listings:
+            self.write_results(path, results[path])
+        self.write_results("all", [result for path in results for result in results[path]])
+
+    def choose_page(self, rng, pages):
+        share = rng.random()
+        for depth_share, first, last in DEPTHS:
+            if share < depth_share:
+                return rng.randint(first, min(last, pages))
+            share -= depth_share
+        return rng.randint(max(1, pages - 10), pages)
+
+    def write_results(self, listing, results):
+        if not results:
+            return
+        times = [elapsed for elapsed, queries, status in results]
+        queries = [queries for elapsed, queries, status in results]
+        self.stdout.write("%-22s %6d %9.1f %9.1f %9.1f %8.1f %8d %6d" % (
+            listing, len(results), percentile(times, 50), percentile(times, 95), percentile(times, 99),
+            float(sum(queries)) / len(queries), max(queries),
+            len([status for elapsed, queries, status in results if status != 200])))
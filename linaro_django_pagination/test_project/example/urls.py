@@ -34,4 +34,7 @@ from django.conf.urls.defaults import (
 urlpatterns = patterns(
     'example.views',
     url(r'^list/$', 'list'),
-    url(r'^complex-list/$', 'complex_list'))
+    url(r'^complex-list/$', 'complex_list'),
+    url(r'^entries/$', 'entry_list'),
+    url(r'^entries/(?P<category_id>\d+)/$', 'category_entry_list'),
+    url(r'^two-entry-lists/$', 'two_entry_lists'))
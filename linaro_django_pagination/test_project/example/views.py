@@ -28,9 +28,11 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
-from django.shortcuts import render_to_response
+from django.shortcuts import get_object_or_404, render_to_response
 from django.template import RequestContext
 
+from example.models import Category, Entry
+
 
 def list(request):
     return render_to_response("example/list.html", {
@@ -43,3 +45,24 @@ def complex_list(request):
         'first_item_list': ["first list item %d" % item for item in range(1000)],
         'second_item_list': ["second list item %d" % item for item in range(1000)],
     }, RequestContext(request))
+
+
+def entry_list(request):
+    return render_to_response("example/entry_list.html", {
+        'entry_list': Entry.objects.all(),
+    }, RequestContext(request))
+
+
+def category_entry_list(request, category_id):
+    category = get_object_or_404(Category, pk=category_id)
+    return render_to_response("example/entry_list.html", {
+        'category': category,
+        'entry_list': Entry.objects.filter(category=category),
+    }, RequestContext(request))
+
+
+def two_entry_lists(request):
+    return render_to_response("example/two_entry_lists.html", {
+        'recent_entry_list': Entry.objects.all(),
+        'top_entry_list': Entry.objects.order_by('-score', 'id'),
+    }, RequestContext(request))
@@ -0,0 +1,72 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Helpers for testing templates that use the pagination tags.
+"""
+
+from contextlib import contextmanager
+
+from linaro_django_pagination import signals
+
+
+class PaginationQueriesMixin(object):
+    """
+    Mixin for test cases checking the queries run by the pagination tags.
+    """
+
+    @contextmanager
+    def assertPaginationQueries(self, autopaginate=None, paginate=None):
+        """
+        Asserts that each ``{% autopaginate %}`` and each ``{% paginate %}``
+        rendered inside the block runs exactly the given number of queries.
+        The page is fetched by ``{% autopaginate %}`` while checking, so its
+        query counts for that tag. Tags given None are not checked.
+        """
+        counted = {'autopaginate': [], 'paginate': []}
+
+        def count_paginated(sender, queries, **kwargs):
+            counted['autopaginate'].append(queries)
+
+        def count_rendered(sender, queries, **kwargs):
+            counted['paginate'].append(queries)
+
+        signals.paginated.connect(count_paginated)
+        signals.pagination_rendered.connect(count_rendered)
+        try:
+            yield counted
+        finally:
+            signals.paginated.disconnect(count_paginated)
+            signals.pagination_rendered.disconnect(count_rendered)
+        for tag, expected in (('autopaginate', autopaginate), ('paginate', paginate)):
+            if expected is not None:
+                self.assertTrue(counted[tag], "No {%% %s %%} was rendered" % tag)
+                for queries in counted[tag]:
+                    self.assertEqual(
+                        queries, expected, "{%% %s %%} ran %d queries, expected %d" % (tag, queries, expected))
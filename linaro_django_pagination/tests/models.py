@@ -0,0 +1,25 @@
+from django.db import models
+
+
+class Category(models.Model):
+    name = models.CharField(max_length=32)
+
+    class Meta:
+        app_label = 'linaro_django_pagination'
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=32)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+
+    class Meta:
+        app_label = 'linaro_django_pagination'
+
+
+class Item(models.Model):
+    position = models.IntegerField()
+    category = models.ForeignKey(Category, null=True, on_delete=models.CASCADE)
+    tags = models.ManyToManyField(Tag)
+
+    class Meta:
+        app_label = 'linaro_django_pagination'
@@ -7,7 +7,11 @@ DATABASES = {
     'default': {
         'NAME': ':memory:',
         'ENGINE': 'django.db.backends.sqlite3',
-    }
+    },
+    'replica': {
+        'NAME': ':memory:',
+        'ENGINE': 'django.db.backends.sqlite3',
+    },
 }
 
 SECRET_KEY = 'fake-key'
@@ -27,22 +27,47 @@
 # THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import threading
+import time
+import unittest
 from contextlib import contextmanager
 
+try:
+    import jinja2
+except ImportError:
+    jinja2 = None
+
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.http import HttpRequest as DjangoHttpRequest, Http404, QueryDict
 from django.template import Template, Context, TemplateSyntaxError
+from django.template.loader import get_template
+from django.template.response import TemplateResponse
+from django.test import override_settings
 
 try:
     from django.test import SimpleTestCase
 except ImportError:  # Django 1.2 compatible
     from django.test import TestCase as SimpleTestCase
 
-from linaro_django_pagination.paginator import InfinitePaginator, FinitePaginator, InfinitePage
-from linaro_django_pagination.templatetags.pagination_tags import paginate
-from linaro_django_pagination.middleware import PaginationMiddleware, get_page
-from linaro_django_pagination import settings
+from linaro_django_pagination.paginator import (
+    FinitePaginator,
+    InfinitePage,
+    InfinitePaginator,
+    RemotePaginator,
+    RemoteSource,
+)
+from linaro_django_pagination.templatetags.pagination_tags import (
+    PaginateNode,
+    get_partial_template,
+    paginate,
+    warm_up_templates,
+)
+from linaro_django_pagination.middleware import DeepPaginationBudgetMiddleware, PaginationMiddleware, get_page
+from linaro_django_pagination.stats import Histogram, merge_snapshots
+from linaro_django_pagination import settings, signals
 
 
 class HttpRequest(DjangoHttpRequest):
@@ -56,8 +81,10 @@ def override_app_setting(key, value):
     """
     restore_value = getattr(settings, key)
     setattr(settings, key, value)
-    yield
-    setattr(settings, key, restore_value)
+    try:
+        yield
+    finally:
+        setattr(settings, key, restore_value)
 
 
 class CommonTestCase(SimpleTestCase):
@@ -374,6 +401,48 @@ class TemplateRenderingTestCase(SimpleTestCase):
                           "{% load pagination_tags %}{% autopaginate var %}{% paginate using %}")
         self.assertRaises(TemplateSyntaxError, Template,
                           "{% load pagination_tags %}{% autopaginate var %}{% paginate something %}")
+        self.assertRaises(TemplateSyntaxError, Template,
+                          "{% load pagination_tags %}{% autopaginate var using %}")
+        self.assertRaises(TemplateSyntaxError, Template,
+                          "{% load pagination_tags %}{% autopaginate var using infinite %}")
+
+    def test_using_infinite_paginator(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 5 using \"infinite\" as foo %}"
+                     "{{ foo|join:',' }}{% paginate %}")
+        request = HttpRequest()
+        request.GET = QueryDict('page=2')
+        context = Context({'var': list(range(21)), 'request': request})
+        content = t.render(context)
+        self.assertTrue(content.startswith('5,6,7,8,9'))
+        self.assertIsInstance(context['paginator'], InfinitePaginator)
+        self.assertIn('<a href="?page=3" class="next">', content)
+        self.assertNotIn('class="page"', content)
+
+    def test_using_paginator_without_context_var(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 10 3 using 'infinite' %}{{ var|join:',' }}")
+        content = t.render(Context({'var': list(range(21)), 'request': HttpRequest()}))
+        self.assertEqual(content, ','.join(str(x) for x in range(10)))
+
+    def test_using_dotted_path(self):
+        t = Template("{% load pagination_tags %}"
+                     "{% autopaginate var 10 using 'django.core.paginator.Paginator' %}{{ paginator.num_pages }}")
+        self.assertEqual(t.render(Context({'var': range(21), 'request': HttpRequest()})), '3')
+
+    def test_using_registered_name(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 10 using 'plain' %}{{ paginator.num_pages }}")
+        with override_app_setting('PAGINATOR_CLASSES', {'plain': 'django.core.paginator.Paginator'}):
+            self.assertEqual(t.render(Context({'var': range(21), 'request': HttpRequest()})), '3')
+
+    def test_using_unknown_name(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 10 using 'unknown' %}")
+        self.assertRaises(ImproperlyConfigured, t.render, Context({'var': range(21), 'request': HttpRequest()}))
+
+    def test_default_paginator_setting(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 10 %}")
+        context = Context({'var': range(21), 'request': HttpRequest()})
+        with override_app_setting('DEFAULT_PAGINATOR', 'infinite'):
+            t.render(context)
+        self.assertIsInstance(context['paginator'], InfinitePaginator)
 
     def test_paginate_custom_template(self):
         t = Template("{% load pagination_tags %}{% autopaginate var 20 %}"
@@ -389,6 +458,46 @@ class TemplateRenderingTestCase(SimpleTestCase):
         self.assertIn('<div class="pagination">', content)
         self.assertIn('<a href="?page=2"', content)
 
+    def test_paginate_template_resolved_once(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 20 %}"
+                     "{% paginate using 'not_exists_template.html' %}")
+        [node] = t.nodelist.get_nodes_by_type(PaginateNode)
+        t.render(Context({'var': range(21), 'request': HttpRequest()}))
+        self.assertEqual(node.templates[False].name, 'pagination/pagination.html')
+        node.templates[False] = Template("{{ page_obj.number }} of {{ paginator.num_pages }}")
+        self.assertEqual(t.render(Context({'var': range(21), 'request': HttpRequest()})), '1 of 2')
+        with override_settings(DEBUG=True):
+            content = t.render(Context({'var': range(21), 'request': HttpRequest()}))
+        self.assertIn('<div class="pagination">', content)
+
+    def test_paginate_context_restored(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 20 %}{% paginate %}{{ is_paginated }}")
+        content = t.render(Context({'var': range(21), 'request': HttpRequest()}))
+        self.assertTrue(content.rstrip().endswith('</div>'))
+
+    def test_repeated_paginate(self):
+        rendered = []
+
+        def receiver(sender, template, **kwargs):
+            rendered.append(template)
+        signals.pagination_rendered.connect(receiver)
+        self.addCleanup(signals.pagination_rendered.disconnect, receiver)
+        t = Template("{% load pagination_tags %}{% autopaginate var 5 %}{% paginate %}|{% paginate %}|"
+                     "{% paginate using 'custom_pagination.html' %}")
+        request = HttpRequest()
+        content = t.render(Context({'var': range(21), 'request': request}))
+        top, bottom, custom = content.split('|')
+        self.assertEqual(top, bottom)
+        self.assertIn('<div class="custom_pagination">', custom)
+        self.assertEqual(rendered, [None, 'custom_pagination.html'])
+        # Another list paginated in the same request is not mistaken for it
+        content = t.render(Context({'var': range(6), 'request': request}))
+        self.assertNotIn('?page=3', content.split('|')[0])
+        self.assertEqual(len(rendered), 4)
+
+    def test_warm_up_templates(self):
+        warm_up_templates()
+
     def test_keeping_get_vars_in_paginate(self):
         t = Template("{% load pagination_tags %}{% autopaginate var 20 %}{% paginate %}")
 
@@ -403,6 +512,30 @@ class TemplateRenderingTestCase(SimpleTestCase):
         )
 
 
+class CountFreePaginateTestCase(SimpleTestCase):
+    def setUp(self):
+        self.p = InfinitePaginator(range(21), 5)
+
+    def test_no_page_links(self):
+        pg = paginate({'paginator': self.p, 'page_obj': self.p.page(2)})
+        self.assertListEqual(pg['pages'], [])
+        self.assertTrue(pg['is_paginated'])
+        self.assertEqual(pg['records']['first'], 6)
+        self.assertEqual(pg['records']['last'], 10)
+
+    def test_single_page(self):
+        p = InfinitePaginator(range(3), 5)
+        self.assertFalse(paginate({'paginator': p, 'page_obj': p.page(1)})['is_paginated'])
+
+    def test_previous_and_next_links(self):
+        t = Template("{% load pagination_tags %}{% paginate %}")
+        request = HttpRequest()
+        content = t.render(Context({'paginator': self.p, 'page_obj': self.p.page(3), 'request': request}))
+        self.assertIn('<a href="?page=2" class="prev">', content)
+        self.assertIn('<a href="?page=4" class="next">', content)
+        self.assertNotIn('class="page"', content)
+
+
 class InfinitePaginatorTestCase(SimpleTestCase):
     def setUp(self):
         self.p = InfinitePaginator(range(20), 2, link_template='/bacon/page/%d')
@@ -539,6 +672,114 @@ class FinitePaginatorTestCase(SimpleTestCase):
         self.assertEqual(p.validate_number(1), 1)
         self.assertRaises(EmptyPage, p.validate_number, 2)
 
+    def test_on_last_page_has_no_next(self):
+        self.assertFalse(FinitePaginator(range(2), 2, offset=10).page(6).has_next())
+
+
+class RemoteSourceStub(object):
+    """
+    Remote source of 23 items answering after some latency.
+    """
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, offset, limit):
+        with self.lock:
+            self.calls.append((offset, limit))
+        time.sleep(self.latency)
+        return range(23)[offset:offset + limit]
+
+
+class RemotePaginatorTestCase(SimpleTestCase):
+    def setUp(self):
+        self.fetch = RemoteSourceStub()
+
+    def test_pages(self):
+        p = RemotePaginator(self.fetch, 5, prefetch=False)
+        page = p.page(2)
+        self.assertEqual(list(page.object_list), [5, 6, 7, 8, 9])
+        self.assertTrue(page.has_next())
+        self.assertTrue(page.has_previous())
+        self.assertEqual((page.start_index(), page.end_index()), (6, 10))
+        page = p.page(5)
+        self.assertEqual(list(page.object_list), [20, 21, 22])
+        self.assertFalse(page.has_next())
+        self.assertRaises(EmptyPage, p.page, 6)
+        self.assertRaises(NotImplementedError, lambda: p.count)
+
+    def test_orphans(self):
+        p = RemotePaginator(self.fetch, 5, orphans=3, prefetch=False)
+        self.assertEqual(list(p.page(4).object_list), list(range(15, 23)))
+        self.assertFalse(p.page(4).has_next())
+
+    def test_cache(self):
+        source = RemoteSource(self.fetch, cache_size=2)
+        p = RemotePaginator(source, 5, prefetch=False)
+        for number in (1, 2, 1, 3, 1, 2):
+            p.page(number)
+        self.assertEqual(self.fetch.calls, [(0, 6), (5, 6), (10, 6), (5, 6)])
+
+    def test_prefetch(self):
+        p = RemotePaginator(RemoteSource(self.fetch), 5)
+        p.page(1)
+        # Page 2 is being fetched in the background, no need to fetch it again
+        p.page(2)
+        self.assertEqual(self.fetch.calls.count((5, 6)), 1)
+
+    def test_no_prefetch_into_own_source(self):
+        p = RemotePaginator(self.fetch, 5)
+        self.assertFalse(p.prefetch)
+        p.page(1)
+        self.assertEqual(self.fetch.calls, [(0, 6)])
+
+    def test_concurrent_fetches_are_shared(self):
+        source = RemoteSource(self.fetch)
+        threads = [threading.Thread(target=source.get, args=(0, 6)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.fetch.calls, [(0, 6)])
+
+    def test_fetch_errors(self):
+        def fetch(offset, limit):
+            raise IOError('Service unavailable')
+        p = RemotePaginator(fetch, 5)
+        self.assertRaises(IOError, p.page, 1)
+
+    def test_autopaginate(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 5 using 'remote' %}"
+                     "{% for item in var %}{{ item }},{% endfor %}{% paginate %}")
+        request = HttpRequest()
+        request.GET = QueryDict('page=5')
+        content = t.render(Context({'var': RemoteSource(self.fetch), 'request': request}))
+        self.assertIn('20,21,22,', content)
+        self.assertIn('<a href="?page=4" class="prev">', content)
+        self.assertNotIn('class="next"', content)
+
+
+class HistogramTestCase(SimpleTestCase):
+    def test_percentiles(self):
+        h = Histogram()
+        for value in [0.5] * 50 + [3] * 45 + [40] * 4 + [250000]:
+            h.add(value)
+        self.assertEqual(h.samples, 100)
+        self.assertEqual(h.percentile(50), 1)
+        self.assertEqual(h.percentile(95), 5)
+        self.assertEqual(h.percentile(99), 50)
+        self.assertEqual(h.percentile(100), 250000)
+
+    def test_merge_snapshots(self):
+        h = Histogram()
+        h.add(3)
+        merged = merge_snapshots({'/a/?page': {'page': h.to_dict()}}, {'/a/?page': {'page': h}, '/b/?page': {}})
+        self.assertEqual(Histogram(**merged['/a/?page']['page']).samples, 2)
+        self.assertEqual(merged['/b/?page'], {})
+        merged = merge_snapshots(merged, {'/c/?page': {'page': h}, '/d/?page': {'page': h}}, max_listings=3)
+        self.assertEqual(sorted(merged), ['(other)', '/a/?page', '/b/?page', '/c/?page'])
+
 
 class MiddlewareTestCase(SimpleTestCase):
     """
@@ -573,7 +814,198 @@ class MiddlewareTestCase(SimpleTestCase):
         self.middleware.process_request(self.request)
         self.assertEqual(self.request.page('_suffix2'), 5)
 
+    def get_response(self, **headers):
+        self.request.GET = QueryDict('page=2')
+        self.request.META.update(headers)
+        self.middleware.process_request(self.request)
+        context = {'title': 'Items', 'items': list(range(23)), 'request': self.request}
+        response = TemplateResponse(self.request, 'partial_list.html', context)
+        return self.middleware.process_template_response(self.request, response).render()
+
+    def test_full_render(self):
+        response = self.get_response()
+        content = response.content.decode('utf-8')
+        self.assertIn('<h1>Items</h1>', content)
+        self.assertIn('<div class="pagination">', content)
+        self.assertIn('<li>5</li>', content)
+        self.assertEqual(response['Vary'], 'HX-Request')
+
+    def test_partial_render(self):
+        response = self.get_response(HTTP_HX_REQUEST='true')
+        content = response.content.decode('utf-8')
+        self.assertNotIn('<h1>', content)
+        self.assertNotIn('<div class="pagination">', content)
+        self.assertIn('<li>5</li><li>6</li><li>7</li><li>8</li><li>9</li>', content)
+        self.assertIn('<a href="?page=3" class="next">', content)
+        self.assertEqual(response['Vary'], 'HX-Request')
+
+    def test_partial_render_skips_count(self):
+        with override_app_setting('PARTIAL_HEADER', 'X-Partial'):
+            content = self.get_response(HTTP_X_PARTIAL='1').content.decode('utf-8')
+        # A count would have given 5 pages
+        self.assertNotIn('?page=5', content)
+        self.assertIn('?page=3', content)
+
+    @unittest.skipIf(jinja2 is None, "Jinja2 is not installed")
+    def test_jinja2_response(self):
+        templates = [{
+            'BACKEND': 'django.template.backends.jinja2.Jinja2',
+            'APP_DIRS': True,
+            'DIRS': [os.path.join(os.path.dirname(__file__), 'jinja2')],
+            'OPTIONS': {'extensions': ['linaro_django_pagination.jinja.PaginationExtension']},
+        }]
+        self.request.GET = QueryDict('page=2')
+        self.request.META['HTTP_HX_REQUEST'] = 'true'
+        self.middleware.process_request(self.request)
+        with override_settings(TEMPLATES=templates):
+            response = TemplateResponse(self.request, 'jinja_list.html', {'items': list(range(23))})
+            response = self.middleware.process_template_response(self.request, response).render()
+        content = response.content.decode('utf-8')
+        self.assertIn('<li>5</li><li>6</li><li>7</li><li>8</li><li>9</li>', content)
+        self.assertIn('<div class="pagination">', content)
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_partial_template_is_made_once(self):
+        template = get_template('partial_list.html')
+        self.assertIs(get_partial_template(template), get_partial_template(template))
+        self.assertIsNone(get_partial_template(Template("{% load pagination_tags %}{% autopaginate items %}")))
+
+    def test_nested_partial_tags(self):
+        for source in ("{% with entries=items %}{% autopaginate entries 5 %}{% endwith %}"
+                       "{% paginate_partial %}{% endpaginate_partial %}",
+                       "{% autopaginate items 5 %}{% for i in items %}{% paginate_partial %}{{ i }}"
+                       "{% endpaginate_partial %}{% endfor %}"):
+            template = Template("{% load pagination_tags %}" + source)
+            self.assertRaises(TemplateSyntaxError, get_partial_template, template)
+        template = Template("{% load pagination_tags %}{% block list %}{% autopaginate items 5 %}{% endblock %}"
+                            "{% paginate_partial %}{% with entries=items %}{% autopaginate entries 2 %}"
+                            "{% endwith %}{% endpaginate_partial %}")
+        self.assertIsNotNone(get_partial_template(template))
+
+    def test_template_without_partial(self):
+        self.request.META['HTTP_HX_REQUEST'] = 'true'
+        response = TemplateResponse(self.request, 'custom_pagination.html', {})
+        response = self.middleware.process_template_response(self.request, response)
+        self.assertFalse(response.is_rendered)
+        self.assertFalse(response.has_header('Vary'))
+        # Resolved once, for the response to render it
+        self.assertEqual(response.template_name.origin.template_name, 'custom_pagination.html')
+
     # TODO: need tests for using page with upload handlers
     # See details in usage doc.
     def _need_test_upload_handlers(self):
         pass
+
+
+class DeepPaginationBudgetTestCase(SimpleTestCase):
+    def setUp(self):
+        self.middleware = DeepPaginationBudgetMiddleware()
+        self.addCleanup(cache.clear)
+
+    def get(self, query, address='10.0.0.1'):
+        request = HttpRequest()
+        request.GET = QueryDict(query)
+        request.META['REMOTE_ADDR'] = address
+        return request, self.middleware.process_request(request)
+
+    def test_budget(self):
+        with override_app_setting('DEEP_BUDGET', 2), override_app_setting('DEEP_PAGE', 5):
+            for query in ('page=5', 'page_items=12&page=1', 'page=4', 'page=x'):
+                self.assertIsNone(self.get(query)[1])
+            request, response = self.get('page=6')
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '60')
+            # Shallow pages and other clients are not limited
+            self.assertIsNone(self.get('page=2')[1])
+            self.assertIsNone(self.get('page=6', address='10.0.0.2')[1])
+
+    def test_other_parameters(self):
+        with override_app_setting('DEEP_BUDGET', 0):
+            for query in ('page_size=500', 'pages=500', 'pagesize=500&page=2'):
+                self.assertIsNone(self.get(query)[1])
+            self.assertEqual(self.get('page_items=12')[1].status_code, 429)
+
+    def test_body_is_not_read(self):
+        request = HttpRequest()
+        request.GET = QueryDict('page=1')
+        request.POST = QueryDict('page=50')
+        request.META['REMOTE_ADDR'] = '10.0.0.1'
+        with override_app_setting('DEEP_BUDGET', 0):
+            self.assertIsNone(self.middleware.process_request(request))
+
+    def test_no_budget(self):
+        with override_app_setting('DEEP_BUDGET', None):
+            for number in range(100):
+                self.assertIsNone(self.get('page=100')[1])
+
+    def test_count_free(self):
+        with override_app_setting('DEEP_BUDGET', 0), override_app_setting('DEEP_BUDGET_ACTION', 'count_free'):
+            request, response = self.get('page=10')
+        self.assertIsNone(response)
+        self.assertTrue(request.pagination_count_free)
+        context = Context({'var': list(range(30)), 'request': request})
+        Template("{% load pagination_tags %}{% autopaginate var 2 %}").render(context)
+        self.assertIsInstance(context['paginator'], InfinitePaginator)
+
+
+@unittest.skipIf(jinja2 is None, "Jinja2 is not installed")
+class JinjaTestCase(SimpleTestCase):
+    def setUp(self):
+        self.environment = jinja2.Environment(
+            loader=jinja2.PackageLoader('linaro_django_pagination', 'jinja2'), autoescape=True,
+            extensions=['linaro_django_pagination.jinja.PaginationExtension'])
+        self.request = HttpRequest()
+
+    def render(self, source, query='', **context):
+        self.request.GET = QueryDict(query)
+        return self.environment.from_string(source).render(context, request=self.request)
+
+    def test_autopaginate(self):
+        source = ("{% set items = autopaginate(items, 5) %}{% for item in items %}{{ item }},{% endfor %}"
+                  "|{{ items.page_obj.number }}/{{ items.paginator.num_pages }}")
+        self.assertEqual(self.render(source, 'page=3', items=list(range(23))), '10,11,12,13,14,|3/5')
+        source = "{% set items = autopaginate(items, 5, 3, page_suffix='_items') %}{{ items|list }}"
+        self.assertEqual(self.render(source, 'page_items=4', items=list(range(23))),
+                         '[15, 16, 17, 18, 19, 20, 21, 22]')
+
+    def test_invalid_page(self):
+        source = "{% set items = autopaginate(items, 5) %}{{ items.invalid_page }}{{ paginate(items) }}"
+        self.assertEqual(self.render(source, 'page=7', items=list(range(23))), 'True')
+        with override_app_setting('INVALID_PAGE_RAISES_404', True):
+            self.assertRaises(Http404, self.render, source, 'page=7', items=list(range(23)))
+
+    def test_paginate(self):
+        source = "{% set items = autopaginate(items, 5) %}{{ paginate(items) }}"
+        content = self.render(source, 'page=2&q=a%26b', items=list(range(23)))
+        django_content = Template("{% load pagination_tags %}{% autopaginate items 5 %}{% paginate %}").render(
+            Context({'items': list(range(23)), 'request': self.request}))
+        self.assertEqual(content.split(), django_content.split())
+        self.assertIn('<a href="?page=3&amp;q=a%26b" class="next">', content)
+
+    def test_infinite(self):
+        source = "{% set items = autopaginate(items, 5, using='infinite') %}{{ paginate(items) }}"
+        content = self.render(source, 'page=2', items=list(range(23)))
+        self.assertIn('class="prev"', content)
+        self.assertIn('<a href="?page=3" class="next">', content)
+        self.assertNotIn('class="page"', content)
+
+    def test_repeated_paginate(self):
+        source = "{% set items = autopaginate(items, 5) %}{{ paginate(items) }}|{{ paginate(items) }}"
+        rendered = []
+
+        def receiver(sender, **kwargs):
+            rendered.append(sender)
+        signals.pagination_rendered.connect(receiver)
+        self.addCleanup(signals.pagination_rendered.disconnect, receiver)
+        top, bottom = self.render(source, 'page=2', items=list(range(23))).split('|')
+        self.assertEqual(top, bottom)
+        self.assertIn('class="next"', top)
+        self.assertEqual(len(rendered), 1)
+
+    def test_view_paginated(self):
+        paginator = Paginator(list(range(23)), 5)
+        page_obj = paginator.page(2)
+        source = "{% for item in autopaginate(page_obj.object_list, 10) %}{{ item }},{% endfor %}{{ paginate() }}"
+        content = self.render(source, 'page=2', paginator=paginator, page_obj=page_obj)
+        self.assertTrue(content.startswith('5,6,7,8,9,'))
+        self.assertIn('<span class="current page">2</span>', content)
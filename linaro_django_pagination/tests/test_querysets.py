@@ -0,0 +1,1159 @@
+# Copyright (c) 2008, Eric Florenzano
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+from django.conf.urls import url
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.core.paginator import Paginator, EmptyPage
+from django.db.models import Count, F, Q
+from django.http import QueryDict
+from django.template import Template, Context
+from django.test import TestCase, override_settings
+from django.views.generic import ListView
+from django.utils.six import StringIO
+from django.test.utils import CaptureQueriesContext
+
+try:
+    from django.urls import resolve
+except ImportError:     # Django < 1.10
+    from django.core.urlresolvers import resolve
+from django.db import connection
+
+from linaro_django_pagination import signals
+from linaro_django_pagination.explain import covering_index, explain, explain_count, index_sql, suggest_index
+from linaro_django_pagination.instrumentation import QueryBudgetExceeded, QueryBudgetWarning
+from linaro_django_pagination.prefetch import Prefetcher, prefetch_page, prefetched_page
+from linaro_django_pagination.paginator import (
+    CountTimeout,
+    InfinitePaginator,
+    LazyCountPaginator,
+    MergePaginator,
+    ReversingPaginator,
+    SimpleCountPaginator,
+    StreamedObjectList,
+    WindowCountPaginator,
+    _total_ordering,
+    count_time_limit,
+    keyset_pages,
+    rank_of,
+    simplified_count,
+    source_pool,
+    stream_page,
+)
+from linaro_django_pagination.slowlog import SlowPaginationLog, logger as slow_logger
+from linaro_django_pagination.stats import PaginationStats, collector
+from linaro_django_pagination.testing import PaginationQueriesMixin
+from linaro_django_pagination.views import PaginationMixin
+from linaro_django_pagination.warmer import warm_up
+from linaro_django_pagination.tests.models import Category, Item, Tag
+from linaro_django_pagination.tests.test_main import HttpRequest, override_app_setting
+
+
+def positions(page):
+    return [item.position for item in page.object_list]
+
+
+class ItemTestCase(TestCase):
+    """
+    Test case with items at positions 0 to 22.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Item.objects.bulk_create([Item(position=position) for position in range(23)])
+
+
+class ReversingPaginatorTestCase(ItemTestCase):
+    def setUp(self):
+        self.queryset = Item.objects.order_by('position')
+
+    def test_pages_match_plain_paginator(self):
+        expected = Paginator(self.queryset, 5, 2)
+        p = ReversingPaginator(self.queryset, 5, 2)
+        self.assertEqual(p.num_pages, expected.num_pages)
+        for number in p.page_range:
+            self.assertListEqual(positions(p.page(number)), positions(expected.page(number)))
+
+    def test_tied_ordering(self):
+        for position in range(20):
+            Item.objects.create(position=position % 2)
+        queryset = Item.objects.filter(position__lt=2).order_by('-position')
+        p = ReversingPaginator(queryset, 3)
+        pks = [item.pk for number in p.page_range for item in p.page(number).object_list]
+        self.assertEqual(sorted(pks), sorted(item.pk for item in queryset))
+        t = Template("{% load pagination_tags %}{% autopaginate var 3 %}"
+                     "{% for item in var %}{{ item.pk }},{% endfor %}")
+        content = ''
+        for number in range(1, 9):
+            request = HttpRequest()
+            request.GET = QueryDict('page=%d' % number)
+            content += t.render(Context({'var': queryset, 'request': request}))
+        self.assertEqual(sorted(int(pk) for pk in content.split(',')[:-1]), sorted(pks))
+
+    def test_distinct_values_are_not_reversed(self):
+        p = ReversingPaginator(Item.objects.values('position').distinct().order_by('position'), 5)
+        self.assertFalse(p.reversible)
+        self.assertEqual([row['position'] for row in p.page(5).object_list], [20, 21, 22])
+
+    def test_extra_ordering_is_not_reversed(self):
+        queryset = Item.objects.extra(order_by=['-position'])
+        p = ReversingPaginator(queryset, 5)
+        self.assertFalse(p.reversible)
+        self.assertEqual(positions(p.page(1)), [22, 21, 20, 19, 18])
+        self.assertEqual(positions(p.page(5)), [2, 1, 0])
+        self.assertEqual([item.position for item in _total_ordering(queryset)[:3]], [22, 21, 20])
+
+    def test_distinct_on_is_not_reversed(self):
+        queryset = Item.objects.order_by('position', '-pk')
+        queryset.query.distinct_fields = ('position',)
+        self.assertFalse(ReversingPaginator(queryset, 5).reversible)
+
+    def test_last_page_uses_reversed_ordering(self):
+        p = ReversingPaginator(self.queryset, 5)
+        p.count
+        with self.assertNumQueries(1):
+            page = p.page(5)
+            self.assertListEqual(positions(page), [20, 21, 22])
+        self.assertTrue(page.has_previous())
+        self.assertFalse(page.has_next())
+
+    def test_first_page_keeps_lazy_slice(self):
+        p = ReversingPaginator(self.queryset, 5)
+        self.assertEqual(p.page(1).object_list.query.low_mark, 0)
+
+    def test_unordered_queryset_is_not_reversed(self):
+        p = ReversingPaginator(Item.objects.all(), 5)
+        self.assertEqual(p.page(5).object_list.query.low_mark, 20)
+
+    def test_plain_list(self):
+        p = ReversingPaginator(list(range(23)), 5)
+        self.assertListEqual(list(p.page(5).object_list), [20, 21, 22])
+
+    def test_autopaginate_tail_page(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 5 as foo %}"
+                     "{% for item in foo %}{{ item.position }},{% endfor %}")
+        request = HttpRequest()
+        request.GET = QueryDict('page=4')
+        content = t.render(Context({'var': self.queryset, 'request': request}))
+        self.assertEqual(content, '15,16,17,18,19,')
+
+
+class WindowCountPaginatorTestCase(ItemTestCase):
+    def setUp(self):
+        self.queryset = Item.objects.order_by('position')
+
+    def test_pages_match_plain_paginator(self):
+        expected = Paginator(self.queryset, 5, 2)
+        for number in expected.page_range:
+            p = WindowCountPaginator(self.queryset, 5, 2)
+            self.assertListEqual(positions(p.page(number)), positions(expected.page(number)))
+            self.assertEqual(p.count, expected.count)
+
+    def test_single_query_for_page_and_count(self):
+        p = WindowCountPaginator(self.queryset, 5)
+        with self.assertNumQueries(1):
+            page = p.page(2)
+            self.assertEqual(p.count, 23)
+            self.assertEqual(p.num_pages, 5)
+            self.assertTrue(page.has_next())
+        self.assertFalse(hasattr(page.object_list[0], WindowCountPaginator.count_alias))
+
+    def test_out_of_range_page_falls_back_to_count(self):
+        p = WindowCountPaginator(self.queryset, 5)
+        with self.assertNumQueries(2):
+            self.assertRaises(EmptyPage, p.page, 6)
+
+    def test_orphan_range(self):
+        queryset = self.queryset.filter(position__lt=12)
+        expected = Paginator(queryset, 5, 2)
+        self.assertRaises(EmptyPage, expected.page, 3)
+        p = WindowCountPaginator(queryset, 5, 2)
+        with self.assertNumQueries(1):
+            self.assertRaises(EmptyPage, p.page, 3)
+        self.assertEqual(p.num_pages, 2)
+        self.assertListEqual(positions(WindowCountPaginator(queryset, 5, 2).page(2)), list(range(5, 12)))
+
+    def test_aggregate_annotation(self):
+        p = WindowCountPaginator(self.queryset.annotate(n=Count('tags')), 5)
+        self.assertListEqual(positions(p.page(2)), [5, 6, 7, 8, 9])
+        self.assertEqual(p.count, 23)
+
+    def test_empty_first_page(self):
+        p = WindowCountPaginator(Item.objects.none(), 5)
+        self.assertListEqual(list(p.page(1).object_list), [])
+        self.assertEqual(p.count, 0)
+
+    def test_distinct_queryset_is_counted_separately(self):
+        p = WindowCountPaginator(self.queryset.distinct(), 5)
+        with self.assertNumQueries(2):
+            self.assertListEqual(positions(p.page(1)), [0, 1, 2, 3, 4])
+            self.assertEqual(p.count, 23)
+
+    def test_autopaginate_with_window_count(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 5 as foo %}"
+                     "{% for item in foo %}{{ item.position }},{% endfor %}{{ paginator.count }}")
+        request = HttpRequest()
+        request.GET = QueryDict('page=2')
+        with override_app_setting('WINDOW_COUNT', True):
+            with self.assertNumQueries(1):
+                content = t.render(Context({'var': self.queryset, 'request': request}))
+        self.assertEqual(content, '5,6,7,8,9,23')
+
+
+class LazyCountPaginatorTestCase(ItemTestCase):
+    def setUp(self):
+        self.queryset = Item.objects.order_by('position')
+
+    def test_pages_match_plain_paginator(self):
+        expected = Paginator(self.queryset, 5, 2)
+        for number in expected.page_range:
+            p = LazyCountPaginator(self.queryset, 5, 2)
+            page = p.page(number)
+            self.assertListEqual(positions(page), positions(expected.page(number)))
+            self.assertEqual(page.has_next(), expected.page(number).has_next())
+            self.assertEqual(p.count, expected.count)
+
+    def test_single_page_listing_is_not_counted(self):
+        p = LazyCountPaginator(self.queryset, 30)
+        with self.assertNumQueries(1):
+            page = p.page(1)
+            self.assertEqual(len(page.object_list), 23)
+            self.assertEqual(p.count, 23)
+            self.assertFalse(page.has_next())
+
+    def test_last_page_is_not_counted(self):
+        p = LazyCountPaginator(self.queryset, 5)
+        with self.assertNumQueries(1):
+            self.assertListEqual(positions(p.page(5)), [20, 21, 22])
+            self.assertEqual(p.num_pages, 5)
+
+    def test_middle_page_counts_on_demand(self):
+        p = LazyCountPaginator(self.queryset, 5)
+        with self.assertNumQueries(1):
+            page = p.page(2)
+        with self.assertNumQueries(1):
+            self.assertTrue(page.has_next())
+
+    def test_page_absorbed_as_orphans(self):
+        p = LazyCountPaginator(self.queryset, 10, 3)
+        self.assertRaises(EmptyPage, p.page, 3)
+        self.assertEqual(p.count, 23)
+
+    def test_out_of_range_page(self):
+        p = LazyCountPaginator(self.queryset, 5)
+        with self.assertNumQueries(1):
+            self.assertRaises(EmptyPage, p.page, 7)
+
+    def test_empty_first_page(self):
+        p = LazyCountPaginator(Item.objects.none(), 5)
+        self.assertListEqual(list(p.page(1).object_list), [])
+        self.assertEqual(p.count, 0)
+        p = LazyCountPaginator(Item.objects.none(), 5, allow_empty_first_page=False)
+        self.assertRaises(EmptyPage, p.page, 1)
+
+    def test_autopaginate_with_lazy_count(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 30 as foo %}{{ foo|length }}{% paginate %}")
+        with override_app_setting('LAZY_COUNT', True):
+            with self.assertNumQueries(1):
+                content = t.render(Context({'var': self.queryset, 'request': HttpRequest()}))
+        self.assertEqual(content.strip(), '23')
+
+
+class SimplifiedCountTestCase(TestCase):
+    def setUp(self):
+        first = Category.objects.create(name='first')
+        second = Category.objects.create(name='second')
+        a = Tag.objects.create(name='a', category=first)
+        b = Tag.objects.create(name='b', category=first)
+        Tag.objects.create(name='c', category=second)
+        for position in range(12):
+            item = Item.objects.create(position=position, category=[first, second, None][position % 3])
+            if position % 4 == 0:
+                item.tags.add(a, b)
+            elif position % 4 == 1:
+                item.tags.add(a)
+
+    def assertCountSQL(self, queryset):
+        """
+        Checks that simplified_count() agrees with counting the rows in Python
+        and returns the SQL of the COUNT query.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            count = simplified_count(queryset)
+        self.assertEqual(count, len(list(queryset)))
+        self.assertEqual(count, queryset.count())
+        self.assertEqual(len(queries), 1)
+        return queries[0]['sql']
+
+    def test_plain_queryset(self):
+        self.assertCountSQL(Item.objects.all())
+
+    def test_select_related(self):
+        sql = self.assertCountSQL(Item.objects.select_related('category').order_by('category__name'))
+        self.assertNotIn('JOIN', sql)
+
+    def test_annotation_over_nullable_foreign_key(self):
+        sql = self.assertCountSQL(Item.objects.annotate(category_name=F('category__name')))
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('SELECT COUNT(*) FROM (', sql)
+
+    def test_annotation_over_foreign_key(self):
+        sql = self.assertCountSQL(Tag.objects.annotate(category_name=F('category__name')))
+        self.assertNotIn('JOIN', sql)
+
+    def test_annotation_over_multi_valued_join(self):
+        sql = self.assertCountSQL(Item.objects.annotate(tag_name=F('tags__name')))
+        self.assertIn('JOIN', sql)
+
+    def test_filtered_annotation(self):
+        self.assertCountSQL(Item.objects.annotate(
+            category_name=F('category__name')).filter(category_name='first'))
+
+    def test_filter_on_related_field(self):
+        self.assertCountSQL(Item.objects.filter(category__name='second').select_related('category'))
+
+    def test_filter_on_multi_valued_join(self):
+        self.assertCountSQL(Item.objects.filter(tags__category__name='first'))
+
+    def test_aggregate_annotation(self):
+        self.assertCountSQL(Item.objects.annotate(tag_count=Count('tags')).filter(tag_count__gt=0))
+
+    def test_extra_where(self):
+        self.assertCountSQL(Item.objects.annotate(
+            category_name=F('category__name')).extra(where=['"linaro_django_pagination_category"."id" > 1']))
+
+    def test_distinct_over_multi_valued_join(self):
+        sql = self.assertCountSQL(Item.objects.filter(tags__name__in=['a', 'b']).distinct().order_by('-position'))
+        self.assertIn('COUNT(DISTINCT', sql)
+        self.assertNotIn('SELECT COUNT(*) FROM (', sql)
+
+    def test_distinct_with_select_related(self):
+        self.assertCountSQL(Item.objects.filter(tags__name='a').select_related('category').distinct())
+
+    def test_distinct_ordered_by_related_field(self):
+        # The ordering column takes part in DISTINCT, which count() ignores
+        queryset = Item.objects.filter(tags__name__in=['a', 'b']).distinct().order_by('tags__name')
+        self.assertEqual(simplified_count(queryset), queryset.count())
+
+    def test_distinct_values(self):
+        self.assertCountSQL(Item.objects.filter(tags__name__in=['a', 'b']).values('category').distinct())
+
+    def test_distinct_annotation(self):
+        self.assertCountSQL(Item.objects.annotate(tag_name=F('tags__name')).distinct())
+
+    def test_sliced_queryset(self):
+        self.assertCountSQL(Item.objects.order_by('position')[2:7])
+
+    def test_paginator_uses_simplified_count(self):
+        p = SimpleCountPaginator(Item.objects.annotate(category_name=F('category__name')), 5)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(p.count, 12)
+        self.assertNotIn('JOIN', queries[0]['sql'])
+
+
+class ReplicaDatabaseTestCase(ItemTestCase):
+    multi_db = True
+
+    def setUp(self):
+        # The replica lags behind the primary database
+        for position in range(20):
+            Item.objects.using('replica').create(position=position)
+        self.queryset = Item.objects.order_by('position')
+
+    def test_count_using_replica(self):
+        p = SimpleCountPaginator(self.queryset, 5, count_using='replica')
+        self.assertEqual(p.count, 20)
+        self.assertListEqual(positions(p.page(4)), [15, 16, 17, 18, 19])
+        self.assertEqual(p.page(4).object_list.db, 'default')
+
+    def test_pages_are_not_reversed_from_replica_count(self):
+        p = ReversingPaginator(self.queryset, 5, count_using='replica')
+        self.assertEqual([position for number in p.page_range for position in positions(p.page(number))],
+                         list(range(20)))
+
+    def test_pages_using_replica(self):
+        p = ReversingPaginator(self.queryset, 5, count_using='replica', page_using='replica')
+        self.assertEqual(p.count, 20)
+        self.assertListEqual(positions(p.page(4)), [15, 16, 17, 18, 19])
+        self.assertListEqual(positions(LazyCountPaginator(self.queryset, 30, page_using='replica').page(1)),
+                             list(range(20)))
+
+    def test_plain_list_ignores_databases(self):
+        p = SimpleCountPaginator(list(range(23)), 5, count_using='replica', page_using='replica')
+        self.assertEqual(p.count, 23)
+
+    def test_autopaginate_count_using_replica(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 5 %}{{ paginator.count }}")
+        with override_app_setting('COUNT_DATABASE', 'replica'):
+            with self.assertNumQueries(0):
+                content = t.render(Context({'var': self.queryset, 'request': HttpRequest()}))
+        self.assertEqual(content, '20')
+
+
+class CountTimeoutTestCase(TestCase):
+    def setUp(self):
+        Item.objects.bulk_create([Item(position=position) for position in range(2000)])
+        # A filter keeps SQLite from counting the table in a single step
+        self.queryset = Item.objects.filter(position__gte=0).order_by('position')
+
+    def test_count_within_time_limit(self):
+        p = SimpleCountPaginator(self.queryset, 5, count_timeout=60)
+        self.assertEqual(p.count, 2000)
+
+    def test_count_exceeding_time_limit(self):
+        p = SimpleCountPaginator(self.queryset, 5, count_timeout=0)
+        self.assertRaises(CountTimeout, getattr, p, 'count')
+        # The connection is usable after the timeout
+        self.assertEqual(self.queryset.count(), 2000)
+
+    def test_time_limit_does_not_leak(self):
+        with count_time_limit('default', 60):
+            pass
+        self.assertEqual(self.queryset.count(), 2000)
+
+    def test_autopaginate_falls_back_to_infinite_pagination(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 5 as foo %}"
+                     "{% for item in foo %}{{ item.position }},{% endfor %}{% paginate %}")
+        request = HttpRequest()
+        request.GET = QueryDict('page=3')
+        context = Context({'var': self.queryset, 'request': request})
+        with override_app_setting('COUNT_TIMEOUT', 0):
+            content = t.render(context)
+        self.assertTrue(content.startswith('10,11,12,13,14,'))
+        self.assertIsInstance(context['paginator'], InfinitePaginator)
+        self.assertIn('<a href="?page=2" class="prev">', content)
+        self.assertIn('<a href="?page=4" class="next">', content)
+        self.assertNotIn('class="page"', content)
+
+    def test_streamed_page_is_not_counted_twice(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 5 %}"
+                     "{% for item in var %}{{ item.position }},{% endfor %}")
+        request = HttpRequest()
+        request.GET = QueryDict('page=3')
+        context = Context({'var': self.queryset, 'request': request})
+        with override_app_setting('COUNT_TIMEOUT', 0), override_app_setting('STREAM_PER_PAGE', 5):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertTrue(t.render(context).startswith('10,11,12,13,14,'))
+        self.assertEqual(len([query for query in queries if 'COUNT(' in query['sql']]), 1)
+        self.assertIsInstance(context['paginator'], InfinitePaginator)
+
+    def test_prefetch_does_not_count_twice(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 5 %}"
+                     "{% for item in var %}{{ item.position }},{% endfor %}")
+        request = HttpRequest()
+        request.GET = QueryDict('page=3')
+        context = Context({'var': self.queryset, 'request': request})
+        with override_app_setting('COUNT_TIMEOUT', 0), override_app_setting('PREFETCH_NEXT', True):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertTrue(t.render(context).startswith('10,11,12,13,14,'))
+        self.assertEqual(len([query for query in queries if 'COUNT(' in query['sql']]), 1)
+
+
+class InstrumentationTestCase(ItemTestCase):
+    def setUp(self):
+        self.queryset = Item.objects.order_by('position')
+        self.received = []
+        for signal in (signals.paginated, signals.pagination_rendered, signals.paginator_counted):
+            signal.connect(self.receive)
+            self.addCleanup(signal.disconnect, self.receive)
+
+    def receive(self, signal, sender, **kwargs):
+        self.received.append((signal, kwargs))
+
+    def render(self, template, page=2):
+        request = HttpRequest()
+        request.path = '/items/'
+        request.GET = QueryDict('page=%d' % page)
+        return Template(template).render(Context({'var': self.queryset, 'request': request}))
+
+    def test_paginated_signal(self):
+        self.render("{% load pagination_tags %}{% autopaginate var 5 %}")
+        [counted, paginated] = self.received
+        self.assertIs(counted[0], signals.paginator_counted)
+        self.assertEqual(counted[1]['count'], 23)
+        self.assertEqual(counted[1]['using'], 'default')
+        self.assertIs(paginated[0], signals.paginated)
+        kwargs = paginated[1]
+        self.assertEqual(kwargs['page'].number, 2)
+        self.assertEqual(kwargs['page_suffix'], '')
+        self.assertEqual(kwargs['offset'], 5)
+        self.assertEqual(kwargs['per_page'], 5)
+        self.assertEqual(kwargs['queries'], 2)
+        self.assertEqual(kwargs['count_time'], counted[1]['count_time'])
+        self.assertGreaterEqual(kwargs['page_time'], 0)
+        self.assertIsInstance(kwargs['page'].object_list, list)
+
+    def test_pagination_rendered_signal(self):
+        self.render("{% load pagination_tags %}{% autopaginate var 5 %}{% paginate using 'custom_pagination.html' %}")
+        signal, kwargs = self.received[-1]
+        self.assertIs(signal, signals.pagination_rendered)
+        self.assertEqual(kwargs['template'], 'custom_pagination.html')
+        self.assertEqual(kwargs['queries'], 0)
+        self.assertGreater(kwargs['render_time'], 0)
+
+    def test_collector(self):
+        stats = PaginationStats()
+        signals.paginated.connect(stats.record_paginated)
+        self.addCleanup(signals.paginated.disconnect, stats.record_paginated)
+        signals.pagination_rendered.connect(stats.record_rendered)
+        self.addCleanup(signals.pagination_rendered.disconnect, stats.record_rendered)
+        for page in (1, 2, 5):
+            self.render("{% load pagination_tags %}{% autopaginate var 5 %}{% paginate %}", page)
+        histograms = stats.snapshot()['/items/?page']
+        self.assertEqual(sum(histograms['page']['counts']), 3)
+        self.assertEqual(histograms['page']['maximum'], 5)
+        self.assertEqual(sum(histograms['render_time']['counts']), 3)
+        self.assertEqual(sum(histograms['queries']['counts']), 6)
+
+    @override_settings(ROOT_URLCONF='linaro_django_pagination.tests.test_querysets')
+    def test_collector_listings(self):
+        stats = PaginationStats()
+        request = HttpRequest()
+        request.resolver_match = resolve('/items/')
+        stats.record(request, '_items', page=1)
+        self.assertEqual(list(stats.snapshot()),
+                         ['linaro_django_pagination.tests.test_querysets.ItemListView?page_items'])
+        stats.reset()
+        with override_app_setting('STATS_MAX_LISTINGS', 2):
+            for user in range(4):
+                request = HttpRequest()
+                request.path = '/users/%d/items/' % user
+                stats.record(request, '', page=1)
+        snapshot = stats.snapshot()
+        self.assertEqual(sorted(snapshot), ['(other)', '/users/0/items/?page', '/users/1/items/?page'])
+        self.assertEqual(sum(snapshot['(other)']['page']['counts']), 2)
+
+    def test_pagination_stats_command(self):
+        collector.connect()
+        self.addCleanup(collector.disconnect)
+        self.addCleanup(collector.clear)
+        self.render("{% load pagination_tags %}{% autopaginate var 5 %}{% paginate %}")
+        collector.flush()
+        self.render("{% load pagination_tags %}{% autopaginate var 5 %}{% paginate %}", 3)
+        output = StringIO()
+        call_command('pagination_stats', reset=True, stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], '/items/?page')
+        self.assertIn('page         n=2 ', output.getvalue())
+        output = StringIO()
+        call_command('pagination_stats', stdout=output)
+        self.assertEqual(output.getvalue().strip(), 'No pagination statistics collected.')
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class SlowPaginationLogTestCase(ItemTestCase):
+    def setUp(self):
+        self.queryset = Item.objects.order_by('position')
+        self.handler = RecordingHandler()
+        slow_logger.addHandler(self.handler)
+        self.addCleanup(slow_logger.removeHandler, self.handler)
+
+    def render(self, slow_log, page):
+        signals.paginated.connect(slow_log.record)
+        try:
+            request = HttpRequest()
+            request.path = '/items/'
+            request.GET = QueryDict('page=%d' % page)
+            Template("{% load pagination_tags %}{% autopaginate var 5 %}").render(
+                Context({'var': self.queryset, 'request': request}))
+        finally:
+            signals.paginated.disconnect(slow_log.record)
+
+    def test_deep_offset_is_logged(self):
+        slow_log = SlowPaginationLog(offset_threshold=10)
+        self.render(slow_log, 2)
+        self.assertEqual(self.handler.records, [])
+        self.render(slow_log, 4)
+        [record] = self.handler.records
+        entry = record.pagination
+        self.assertEqual(entry['path'], '/items/')
+        self.assertEqual(entry['offset'], 15)
+        self.assertEqual(entry['queries'], 2)
+        self.assertEqual(len(entry['sql']), 2)
+        self.assertIn('COUNT(', entry['sql'][0])
+        self.assertIn(entry['sql'][1], record.getMessage())
+
+    def test_slow_page_is_logged(self):
+        self.render(SlowPaginationLog(time_threshold=0), 1)
+        self.assertEqual(len(self.handler.records), 1)
+        self.render(SlowPaginationLog(time_threshold=60), 1)
+        self.assertEqual(len(self.handler.records), 1)
+
+    def test_rate_limit(self):
+        slow_log = SlowPaginationLog(offset_threshold=0, rate=2)
+        for page in range(2, 6):
+            self.render(slow_log, page)
+        self.assertEqual(len(self.handler.records), 2)
+        slow_log.logged.clear()
+        self.render(slow_log, 2)
+        self.assertEqual(self.handler.records[-1].pagination['suppressed'], 2)
+
+
+class QueryBudgetTestCase(PaginationQueriesMixin, ItemTestCase):
+    def setUp(self):
+        self.queryset = Item.objects.order_by('position')
+
+    def render(self, template):
+        request = HttpRequest()
+        request.GET = QueryDict('page=2')
+        return Template("{% load pagination_tags %}" + template).render(
+            Context({'var': self.queryset, 'request': request}))
+
+    def test_within_budget(self):
+        with override_app_setting('QUERY_BUDGET', 2):
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                self.render("{% autopaginate var 5 %}{% paginate %}")
+        self.assertEqual([w for w in caught if w.category is QueryBudgetWarning], [])
+
+    def test_over_budget_warns(self):
+        with override_app_setting('QUERY_BUDGET', {'autopaginate': 1}):
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                self.render("{% autopaginate var 5 %}{% paginate %}")
+        [warning] = [w for w in caught if w.category is QueryBudgetWarning]
+        self.assertIn('{% autopaginate %} of page ran 2 queries, the budget is 1', str(warning.message))
+
+    def test_over_budget_raises(self):
+        with override_app_setting('QUERY_BUDGET', {'paginate': 0}):
+            with override_app_setting('QUERY_BUDGET_RAISE', True):
+                # has_next of an infinite page looks for the next item
+                self.assertRaises(QueryBudgetExceeded, self.render,
+                                  "{% autopaginate var 5 using 'infinite' %}{% paginate %}")
+
+    def test_assert_pagination_queries(self):
+        with self.assertPaginationQueries(autopaginate=2, paginate=0):
+            self.render("{% autopaginate var 5 %}{% paginate %}")
+        with self.assertPaginationQueries(autopaginate=1):
+            self.render("{% autopaginate var 5 using 'infinite' %}{% paginate %}")
+
+    def test_assert_pagination_queries_failure(self):
+        with self.assertRaises(AssertionError):
+            with self.assertPaginationQueries(autopaginate=1):
+                self.render("{% autopaginate var 5 %}")
+        with self.assertRaises(AssertionError):
+            with self.assertPaginationQueries(paginate=0):
+                self.render("{% autopaginate var 5 %}")
+
+
+class ItemListView(PaginationMixin, ListView):
+    queryset = Item.objects.order_by('position')
+    template_name = 'item_list.html'
+    paginate_by = 5
+
+    def get_context_data(self, **kwargs):
+        context = super(ItemListView, self).get_context_data(**kwargs)
+        context['request'] = self.request
+        return context
+
+
+class PaginationMixinTestCase(PaginationQueriesMixin, ItemTestCase):
+    def get(self, query='', view_class=ItemListView):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.GET = QueryDict(query)
+        return view_class.as_view()(request).render()
+
+    def test_page(self):
+        response = self.get('page=2')
+        self.assertEqual(response.context_data['page_obj'].number, 2)
+        self.assertEqual(response.context_data['page_suffix'], '')
+        self.assertTrue(response.context_data['is_paginated'])
+        content = response.content.decode('utf-8')
+        self.assertTrue(content.startswith('5,6,7,8,9,'))
+        self.assertIn('<a href="?page=5" class="page">5</a>', content)
+
+    def test_autopaginate_is_skipped(self):
+        with self.assertPaginationQueries(autopaginate=2, paginate=0) as counted:
+            self.get('page=2')
+        # Only the view paginated
+        self.assertEqual(len(counted['autopaginate']), 1)
+
+    def test_page_suffix(self):
+        view_class = type('SuffixedItemListView', (ItemListView,), {'page_suffix': '_items'})
+        response = self.get('page=3&page_items=4', view_class)
+        self.assertEqual(response.context_data['page_obj'].number, 4)
+        self.assertIn('href="?page_items=5&amp;page=3"', response.content.decode('utf-8'))
+
+    def test_paginator_class(self):
+        view_class = type('InfiniteItemListView', (ItemListView,), {'paginator_class': 'infinite'})
+        response = self.get('page=2', view_class)
+        self.assertIsInstance(response.context_data['paginator'], InfinitePaginator)
+
+    def test_partial_request(self):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_HX_REQUEST'] = 'true'
+        view_class = type('PartialItemListView', (ItemListView,), {'template_name': 'partial_list.html'})
+        response = view_class.as_view()(request)
+        self.assertIsInstance(response.context_data['paginator'], InfinitePaginator)
+        # Templates without paginate_partial are rendered in full, with a count
+        response = ItemListView.as_view()(request)
+        self.assertNotIsInstance(response.context_data['paginator'], InfinitePaginator)
+
+    def test_invalid_page(self):
+        with override_app_setting('INVALID_PAGE_RAISES_404', False):
+            response = self.get('page=10')
+        self.assertTrue(response.context_data['invalid_page'])
+        self.assertEqual(list(response.context_data['object_list']), [])
+
+
+class StreamPageTestCase(ItemTestCase):
+    def setUp(self):
+        self.queryset = Item.objects.order_by('position')
+
+    def test_stream_page(self):
+        page = stream_page(SimpleCountPaginator(self.queryset, 10).page(3), 2)
+        self.assertIsInstance(page.object_list, StreamedObjectList)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(page.object_list), 3)
+        with self.assertNumQueries(1):
+            self.assertEqual(positions(page), [20, 21, 22])
+
+    def test_stream_fields(self):
+        page = stream_page(SimpleCountPaginator(self.queryset, 10).page(1), 2, ['position'])
+        self.assertEqual(list(page.object_list)[:2], [{'position': 0}, {'position': 1}])
+
+    def test_fetched_pages_are_not_streamed(self):
+        # Infinite pages are fetched to tell whether they are empty
+        page = stream_page(InfinitePaginator(self.queryset, 10).page(3), 2)
+        self.assertNotIsInstance(page.object_list, StreamedObjectList)
+
+    def test_length_without_count(self):
+        object_list = StreamedObjectList(self.queryset[20:30], 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(object_list), 3)
+
+    def test_lists_are_not_streamed(self):
+        page = stream_page(SimpleCountPaginator(list(range(23)), 10).page(1), 2)
+        self.assertEqual(page.object_list, list(range(10)))
+
+    def test_autopaginate_streams(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 5 %}"
+                     "{% for item in var %}{{ item.position }}{% if not forloop.last %},{% endif %}{% endfor %}")
+        request = HttpRequest()
+        request.GET = QueryDict('page=2')
+        context = Context({'var': self.queryset, 'request': request})
+        with override_app_setting('STREAM_PER_PAGE', 5):
+            self.assertEqual(t.render(context), '5,6,7,8,9')
+        self.assertIsInstance(context['var'], StreamedObjectList)
+
+    def test_tail_pages_are_streamed(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 5 %}"
+                     "{% for item in var %}{{ item.position }}{% if not forloop.last %},{% endif %}{% endfor %}")
+        for paginator in ('reversing', 'window_count', 'lazy_count'):
+            request = HttpRequest()
+            request.GET = QueryDict('page=5')
+            context = Context({'var': self.queryset, 'request': request})
+            with override_app_setting('STREAM_PER_PAGE', 5), override_app_setting('DEFAULT_PAGINATOR', paginator):
+                self.assertEqual(t.render(context), '20,21,22')
+            self.assertIsInstance(context['var'], StreamedObjectList)
+
+
+class PageOfTestCase(ItemTestCase):
+    def setUp(self):
+        self.queryset = Item.objects.order_by('position')
+
+    def test_page_of(self):
+        paginator = SimpleCountPaginator(self.queryset, 5)
+        for item in self.queryset:
+            with self.assertNumQueries(1):
+                number = paginator.page_of(item)
+            self.assertIn(item, paginator.page(number).object_list)
+
+    def test_descending(self):
+        paginator = SimpleCountPaginator(Item.objects.order_by('-position'), 5)
+        self.assertEqual(paginator.page_of(Item.objects.get(position=22)), 1)
+        self.assertEqual(paginator.page_of(Item.objects.get(position=2)), 5)
+
+    def test_ties_are_broken_by_pk(self):
+        Item.objects.update(position=0)
+        paginator = SimpleCountPaginator(self.queryset, 5)
+        for item in self.queryset:
+            self.assertIn(item, paginator.page(paginator.page_of(item)).object_list)
+
+    def test_orphans(self):
+        paginator = SimpleCountPaginator(self.queryset, 5, orphans=3)
+        self.assertEqual(paginator.page_of(Item.objects.get(position=22)), 4)
+        self.assertEqual(paginator.page_of(Item.objects.get(position=14)), 3)
+
+    def test_list(self):
+        paginator = SimpleCountPaginator(list(range(23)), 5)
+        self.assertEqual(paginator.page_of(12), 3)
+
+    def test_unrankable(self):
+        item = Item.objects.get(position=3)
+        self.assertRaises(ValueError, rank_of, Item.objects.all(), item)
+        self.assertRaises(ValueError, rank_of, Item.objects.order_by('category__name'), item)
+        self.assertRaises(ValueError, rank_of, Item.objects.order_by('category'), item)
+        self.assertRaises(ValueError, rank_of, Item.objects.order_by('category_id'), item)
+        Item.objects.update(category=Category.objects.create(name='a'))
+        item = Item.objects.get(position=3)
+        self.assertEqual(rank_of(Item.objects.order_by('-category_id', 'position'), item), 3)
+
+    def test_template_tag(self):
+        t = Template("{% load pagination_tags %}{% page_of item in var 5 %}|"
+                     "{% page_of item in var 5 suffix '_var' as link %}{{ link }}")
+        content = t.render(Context({'var': self.queryset, 'item': Item.objects.get(position=12)}))
+        self.assertEqual(content, '?page=3|?page_var=3')
+
+    def test_template_tag_without_rank(self):
+        t = Template("{% load pagination_tags %}{% page_of item in var 5 %}|{% page_of item in var 5 as link %}")
+        for queryset in (Item.objects.order_by('category', 'position'), self.queryset[:10]):
+            content = t.render(Context({'var': queryset, 'item': Item.objects.get(position=12)}))
+            self.assertEqual(content, '|')
+
+
+class MergePaginatorTestCase(ItemTestCase):
+    def setUp(self):
+        self.querysets = [
+            Item.objects.filter(position__lt=10).order_by('-position'),
+            Item.objects.filter(position__gte=10, position__lt=15).order_by('-position'),
+            Item.objects.filter(position__gte=15).order_by('-position'),
+        ]
+
+    def test_merge_querysets(self):
+        paginator = MergePaginator(self.querysets, 5, max_workers=1)
+        self.assertEqual(positions(paginator.page(1)), [22, 21, 20, 19, 18])
+        self.assertEqual(positions(paginator.page(3)), [12, 11, 10, 9, 8])
+        self.assertEqual(paginator.count, 23)
+        self.assertEqual(positions(paginator.page(5)), [2, 1, 0])
+
+    def test_queries(self):
+        paginator = MergePaginator(self.querysets, 5, max_workers=1)
+        # A count and a page per source
+        with self.assertNumQueries(6):
+            paginator.page(2)
+        with self.assertNumQueries(3):
+            paginator.page(3)
+
+    def test_out_of_range_page_is_not_fetched(self):
+        paginator = MergePaginator(self.querysets, 5, max_workers=1)
+        # Only the counts
+        with self.assertNumQueries(3):
+            self.assertRaises(EmptyPage, paginator.page, 1000)
+
+    def test_orphans(self):
+        paginator = MergePaginator(self.querysets, 5, orphans=3, max_workers=1)
+        self.assertEqual(paginator.num_pages, 4)
+        self.assertEqual(positions(paginator.page(4)), [7, 6, 5, 4, 3, 2, 1, 0])
+        self.assertRaises(EmptyPage, paginator.page, 5)
+
+    def test_merge_lists_in_threads(self):
+        sources = [list(range(0, 30, 3)), list(range(1, 30, 3)), list(range(2, 30, 3))]
+        paginator = MergePaginator(sources, 7)
+        self.assertEqual(paginator.count, 30)
+        self.assertEqual(list(paginator.page(2).object_list), list(range(7, 14)))
+        executor = source_pool.executor
+        self.assertEqual(list(MergePaginator(sources, 7).page(5).object_list), [28, 29])
+        # The threads are shared by all paginators
+        self.assertIs(source_pool.executor, executor)
+
+    def test_key(self):
+        sources = [['b', 'dd'], ['aaa', 'cccc']]
+        paginator = MergePaginator(sources, 3, key=len)
+        self.assertEqual(list(paginator.page(1).object_list), ['b', 'dd', 'aaa'])
+
+    def test_autopaginate(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 5 using 'merge' %}"
+                     "{% for item in var %}{{ item }},{% endfor %}")
+        request = HttpRequest()
+        request.GET = QueryDict('page=2')
+        content = t.render(Context({'var': [[1, 4, 6, 8], [2, 3, 5, 7, 9]], 'request': request}))
+        self.assertEqual(content, '6,7,8,9,')
+
+
+def item_queryset():
+    return Item.objects.order_by('position')
+
+
+def unordered_item_queryset():
+    return Item.objects.all()
+
+
+def category_item_queryset():
+    return Item.objects.order_by('-category_id', 'position')
+
+
+class PrerenderTestCase(ItemTestCase):
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+
+    def prerender(self, **options):
+        options.setdefault('per_page', 5)
+        options.setdefault('processes', 1)
+        stdout = StringIO()
+        call_command('pagination_prerender', 'linaro_django_pagination.tests.test_querysets.item_queryset',
+                     'item_list.html', self.output, stdout=stdout, **options)
+        return stdout.getvalue().strip()
+
+    def read(self, *path):
+        with open(os.path.join(self.output, *path)) as stream:
+            return stream.read()
+
+    def test_keyset_pages(self):
+        with self.assertNumQueries(5):
+            pages = [[item.position for item in items] for items in keyset_pages(item_queryset(), 5)]
+        self.assertEqual(pages, [list(range(start, min(start + 5, 23))) for start in range(0, 23, 5)])
+        pages = list(keyset_pages(Item.objects.order_by('-position'), 5, orphans=3))
+        self.assertEqual([len(items) for items in pages], [5, 5, 5, 8])
+        self.assertEqual(list(keyset_pages(Item.objects.filter(position__lt=0).order_by('pk'), 5)), [[]])
+
+    def test_prerender(self):
+        self.assertEqual(self.prerender(), "5 pages, 5 written, 0 removed")
+        self.assertTrue(self.read('index.html').startswith('0,1,2,3,4,'))
+        last_page = self.read('page', '5.html')
+        self.assertTrue(last_page.startswith('20,21,22,'))
+        self.assertIn('<a href="?page=4" class="prev">', last_page)
+
+    def test_only_changed_pages_are_written(self):
+        self.prerender()
+        self.assertEqual(self.prerender(), "5 pages, 0 written, 0 removed")
+        Item.objects.filter(position=12).update(position=13)
+        self.assertEqual(self.prerender(), "5 pages, 1 written, 0 removed")
+
+    def test_stale_pages_are_removed(self):
+        self.prerender(suffix='_items')
+        self.assertEqual(self.prerender(suffix='_items', per_page=10), "3 pages, 3 written, 2 removed")
+        self.assertEqual(sorted(os.listdir(os.path.join(self.output, 'page_items'))), ['2.html', '3.html'])
+
+    def test_processes(self):
+        self.assertEqual(self.prerender(processes=2), "5 pages, 5 written, 0 removed")
+        self.assertTrue(self.read('page', '3.html').startswith('10,11,12,13,14,'))
+
+    def test_null_ordering(self):
+        category = Category.objects.create(name="a")
+        Item.objects.filter(position__lt=10).update(category=category)
+        self.assertRaises(CommandError, call_command, 'pagination_prerender',
+                          'linaro_django_pagination.tests.test_querysets.category_item_queryset',
+                          'item_list.html', self.output, per_page=5, processes=1)
+        self.assertEqual(os.listdir(self.output), [])
+
+    def test_unordered_queryset(self):
+        self.assertRaises(CommandError, call_command, 'pagination_prerender',
+                          'linaro_django_pagination.tests.test_querysets.unordered_item_queryset',
+                          'item_list.html', self.output)
+
+
+urlpatterns = [
+    url(r'^items/$', ItemListView.as_view()),
+]
+
+
+class CountCacheTestCase(ItemTestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+
+    def test_count_cache(self):
+        queryset = Item.objects.filter(position__gte=3)
+        self.assertEqual(SimpleCountPaginator(queryset, 5, count_cache='default').count, 20)
+        with self.assertNumQueries(0):
+            self.assertEqual(SimpleCountPaginator(queryset.all(), 5, count_cache='default').count, 20)
+        with self.assertNumQueries(1):
+            self.assertEqual(SimpleCountPaginator(queryset.filter(position__gte=4), 5,
+                                                  count_cache='default').count, 19)
+
+    def test_ordering_is_left_out(self):
+        self.assertEqual(ReversingPaginator(item_queryset(), 5, count_cache='default').count, 23)
+        paginator = SimpleCountPaginator(Item.objects.order_by('-position'), 5, count_cache='default')
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 23)
+        self.assertTrue(paginator.count_cached)
+
+    def test_empty_query(self):
+        paginator = SimpleCountPaginator(Item.objects.filter(pk__in=[]), 5, count_cache='default')
+        self.assertEqual(paginator.count, 0)
+
+    def test_cached_count_is_not_reversed(self):
+        queryset = item_queryset()
+        self.assertEqual(ReversingPaginator(queryset, 5, count_cache='default').count, 23)
+        Item.objects.filter(position__gte=20).delete()
+        paginator = ReversingPaginator(queryset.all(), 5, count_cache='default')
+        self.assertEqual([item.position for item in paginator.page(4)], [15, 16, 17, 18, 19])
+        self.assertTrue(paginator.count_cached)
+
+
+@override_settings(ROOT_URLCONF='linaro_django_pagination.tests.test_querysets',
+                   MIDDLEWARE_CLASSES=['linaro_django_pagination.middleware.PaginationMiddleware'])
+class WarmUpTestCase(ItemTestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+
+    def test_warm_up_queryset(self):
+        with override_app_setting('COUNT_CACHE', 'default'):
+            [(entry, elapsed, error)] = warm_up(['linaro_django_pagination.tests.test_querysets.item_queryset'])
+            self.assertIsNone(error)
+            t = Template("{% load pagination_tags %}{% autopaginate var 5 %}"
+                         "{% for item in var %}{{ item.position }}{% endfor %}{% paginate %}")
+            with self.assertNumQueries(1):
+                t.render(Context({'var': item_queryset(), 'request': HttpRequest()}))
+
+    def test_warm_up_url(self):
+        received = []
+
+        def receiver(sender, page, **kwargs):
+            received.append(page.number)
+        signals.paginated.connect(receiver)
+        self.addCleanup(signals.paginated.disconnect, receiver)
+        [(entry, elapsed, error)] = warm_up(['/items/'], pages=3, concurrency=1)
+        self.assertIsNone(error)
+        self.assertEqual(received, [1, 2, 3])
+
+    def test_errors(self):
+        results = warm_up(['/missing/', 'linaro_django_pagination.tests.test_querysets.missing'], concurrency=2)
+        self.assertEqual([entry for entry, elapsed, error in results],
+                         ['/missing/', 'linaro_django_pagination.tests.test_querysets.missing'])
+        self.assertTrue(all(error is not None for entry, elapsed, error in results))
+        self.assertRaises(CommandError, call_command, 'pagination_warm', '/missing/', stdout=StringIO())
+
+    def test_queryset_without_count_cache(self):
+        [(entry, elapsed, error)] = warm_up(['linaro_django_pagination.tests.test_querysets.item_queryset'])
+        self.assertIsInstance(error, ImproperlyConfigured)
+
+
+class ExplainTestCase(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="a")
+        for position in range(10):
+            Item.objects.create(position=position, category=self.category if position % 2 else None)
+
+    def test_suggest_index(self):
+        queryset = Item.objects.filter(category=self.category, position__gt=3).order_by('-position')
+        self.assertEqual(suggest_index(queryset), [('category_id', False), ('position', True), ('id', False)])
+        # Negated and alternative conditions do not narrow the scan
+        self.assertEqual(suggest_index(Item.objects.exclude(category=self.category).order_by('position')),
+                         [('position', False), ('id', False)])
+        self.assertEqual(suggest_index(Item.objects.filter(Q(category=self.category) | Q(position=1))), [])
+        self.assertEqual(suggest_index(Item.objects.filter(category__name="a").order_by('category__name')), [])
+
+    def test_covering_index(self):
+        self.assertIsNotNone(covering_index(Item.objects.all(), [('id', False)]))
+        self.assertIsNotNone(covering_index(Item.objects.all(), [('category_id', False)]))
+        self.assertIsNone(covering_index(Item.objects.all(), [('position', False), ('id', False)]))
+        self.assertIn('"position" DESC, "id")', index_sql(Item.objects.all(), [('position', True), ('id', False)]))
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', "reads SQLite plans")
+    def test_explain(self):
+        plan = explain(Item.objects.order_by('position'))
+        self.assertEqual((plan.full_scan, plan.sort, plan.cost), (True, True, None))
+        self.assertEqual(plan.problems, ["full scan", "sort without index"])
+        plan = explain(Item.objects.filter(category=self.category).order_by('category'))
+        self.assertEqual((plan.full_scan, plan.sort), (False, False))
+        self.assertTrue(explain_count(Item.objects.filter(position__gt=3)).lines)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command('pagination_explain', 'linaro_django_pagination.tests.test_querysets.item_queryset',
+                     'linaro_django_pagination.tests.test_querysets.missing', offsets='0,5', stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn("  offset 5 ", output)
+        self.assertIn("  index: CREATE INDEX", output)
+        self.assertIn("missing\n  cannot be explained", output)
+        with override_app_setting('WARM_UP', ('/items/',)):
+            self.assertRaises(CommandError, call_command, 'pagination_explain', stdout=StringIO())
+
+
+@override_settings(ROOT_URLCONF='linaro_django_pagination.tests.test_querysets',
+                   MIDDLEWARE_CLASSES=['linaro_django_pagination.middleware.PaginationMiddleware',
+                                       'linaro_django_pagination.middleware.NextPagePrefetchMiddleware'])
+class PrefetchTestCase(TestCase):
+    def setUp(self):
+        for position in range(12):
+            Item.objects.create(position=position)
+        self.addCleanup(cache.clear)
+
+    def test_prefetch_page(self):
+        paginator = ReversingPaginator(item_queryset(), 5, orphans=2)
+        prefetch_page(paginator, 2)
+        with self.assertNumQueries(0):
+            page = prefetched_page(paginator, 2)
+            self.assertEqual([item.position for item in page.object_list], [5, 6, 7, 8, 9, 10, 11])
+            self.assertIsNone(prefetched_page(paginator, 1))
+            self.assertIsNone(prefetched_page(paginator, 3))
+            self.assertIsNone(prefetched_page(InfinitePaginator(item_queryset(), 5), 2))
+
+    def test_next_page(self):
+        with override_app_setting('PREFETCH_NEXT', True), override_app_setting('PREFETCH_WORKERS', 0):
+            response = self.client.get('/items/', {'sort': 'position'})
+            self.assertEqual(response['Link'], '</items/?sort=position&page=2>; rel=prefetch')
+            # Counting, then prefetching the last page
+            with self.assertNumQueries(2):
+                response = self.client.get('/items/', {'page': 2})
+            self.assertTrue(response.content.decode('utf-8').startswith('5,6,7,8,9,\n'))
+            with self.assertNumQueries(1):
+                response = self.client.get('/items/', {'page': 3})
+            self.assertFalse(response.has_header('Link'))
+
+    def test_disabled(self):
+        response = self.client.get('/items/')
+        self.assertFalse(response.has_header('Link'))
+
+    def test_lazy_count_is_not_counted(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 5 %}"
+                     "{% for item in var %}{{ item.position }},{% endfor %}")
+        context = Context({'var': Item.objects.filter(position__lt=3).order_by('position'), 'request': HttpRequest()})
+        with override_app_setting('PREFETCH_NEXT', True), override_app_setting('LAZY_COUNT', True):
+            with self.assertNumQueries(1):
+                self.assertEqual(t.render(context), '0,1,2,')
+            context = Context({'var': item_queryset(), 'request': HttpRequest()})
+            with self.assertNumQueries(1):
+                self.assertEqual(t.render(context), '0,1,2,3,4,')
+            self.assertFalse(hasattr(context['request'], 'pagination_next_pages'))
+
+    def test_infinite_pages_are_not_remembered(self):
+        t = Template("{% load pagination_tags %}{% autopaginate var 5 using 'infinite' %}"
+                     "{% for item in var %}{{ item.position }},{% endfor %}")
+        request = HttpRequest()
+        with override_app_setting('PREFETCH_NEXT', True):
+            with self.assertNumQueries(1):
+                t.render(Context({'var': item_queryset(), 'request': request}))
+        self.assertFalse(hasattr(request, 'pagination_next_pages'))
+
+    def test_bounded(self):
+        prefetcher = Prefetcher()
+        prefetcher.pending = 2
+        with override_app_setting('PREFETCH_WORKERS', 1):
+            self.assertFalse(prefetcher.submit(SimpleCountPaginator(item_queryset(), 5), 2))
@@ -0,0 +1,108 @@
+# Copyright (c) 2008, Eric Florenzano
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Pagination of class-based views.
+"""
+
+from django.core.paginator import InvalidPage
+from django.http import Http404
+from django.template import loader
+
+from linaro_django_pagination import settings
+from linaro_django_pagination.middleware import is_partial_request
+from linaro_django_pagination.templatetags.pagination_tags import (
+    choose_paginator_class,
+    get_paginator,
+    get_partial_template,
+    paginate_list,
+)
+
+
+class PaginationMixin(object):
+    """
+    Paginates the object list of a ``ListView`` the way ``{% autopaginate %}``
+    does, but in the view, before the template is rendered.
+
+    The template gets the usual ``paginator``, ``page_obj``, ``page_suffix``
+    and ``is_paginated`` variables, so ``{% paginate %}`` works as is, and
+    ``{% autopaginate %}`` leaves the already paginated list alone.
+    """
+    #: Items per page, ``PAGINATION_DEFAULT_PAGINATION`` if None
+    paginate_by = None
+    #: Orphans, ``PAGINATION_DEFAULT_ORPHANS`` if None
+    paginate_orphans = None
+    #: Paginator name, dotted path or class, chosen by the settings if None
+    paginator_class = None
+    #: Suffix of the ``page`` request parameter
+    page_suffix = ''
+    #: Fields of the dictionaries streamed pages are made of, model instances if None
+    stream_fields = None
+
+    def get_paginate_by(self, queryset):
+        if self.paginate_by is None:
+            return settings.DEFAULT_PAGINATION
+        return self.paginate_by
+
+    def get_paginate_orphans(self):
+        if self.paginate_orphans is None:
+            return settings.DEFAULT_ORPHANS
+        return self.paginate_orphans
+
+    def is_partial(self):
+        """
+        Tells whether the middleware will only render the paginate_partial
+        content of the template, for a partial request to a template having
+        some.
+        """
+        if not is_partial_request(self.request):
+            return False
+        return get_partial_template(loader.select_template(self.get_template_names())) is not None
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        paginator_class = choose_paginator_class(self.request, self.paginator_class, self.is_partial())
+        return get_paginator(paginator_class, queryset, per_page, orphans)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_paginator(queryset, page_size, orphans=self.get_paginate_orphans())
+        try:
+            paginator, page_obj = paginate_list(paginator, self.request, self.page_suffix, self.stream_fields)
+        except InvalidPage:
+            if settings.INVALID_PAGE_RAISES_404:
+                raise Http404('Invalid page requested.')
+            self.invalid_page = True
+            return (None, None, [], False)
+        return (paginator, page_obj, page_obj.object_list, page_obj.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super(PaginationMixin, self).get_context_data(**kwargs)
+        context['page_suffix'] = self.page_suffix
+        if getattr(self, 'invalid_page', False):
+            context['invalid_page'] = True
+        return context
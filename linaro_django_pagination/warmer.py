@@ -0,0 +1,123 @@
+# Copyright (c) 2010, 2011 Linaro Limited
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials provided
+#       with the distribution.
+#     * Neither the name of the author nor the names of other
+#       contributors may be used to endorse or promote products derived
+#       from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Warming up the counts and first pages of hot listings, for instance right
+after a deploy, before the first requests all pay for them at once.
+"""
+
+from timeit import default_timer
+
+from django.conf import settings as django_settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.query import QuerySet
+from django.test import Client
+
+from linaro_django_pagination import settings
+from linaro_django_pagination.paginator import ThreadPoolExecutor, _closing_connections
+from linaro_django_pagination.templatetags.pagination_tags import get_paginator, get_paginator_class, import_string
+
+
+def default_host():
+    """
+    Returns the first host of ALLOWED_HOSTS that is not a pattern.
+    """
+    for host in django_settings.ALLOWED_HOSTS:
+        if host != '*' and not host.startswith('.'):
+            return host
+    return 'testserver'
+
+
+def load_queryset(entry):
+    """
+    Returns entry if it is a queryset, else the queryset at its dotted path or
+    returned by the function there.
+    """
+    if isinstance(entry, QuerySet):
+        return entry
+    queryset = import_string(entry)
+    if callable(queryset):
+        queryset = queryset()
+    return queryset
+
+
+def is_url_entry(entry):
+    """
+    Tells whether entry is a URL path rather than a queryset.
+    """
+    return not isinstance(entry, QuerySet) and entry.startswith('/')
+
+
+def warm_up_entry(entry, pages=1, per_page=None, host=None):
+    """
+    Counts a queryset, or requests the first pages of a URL path.
+
+    Querysets may be given by dotted path, to the queryset or to a function
+    returning it. Their count is kept in ``PAGINATION_COUNT_CACHE``, without
+    which they raise ImproperlyConfigured, and pages is ignored for them.
+    URLs fill whatever their views cache.
+    """
+    if is_url_entry(entry):
+        client = Client(HTTP_HOST=host or default_host())
+        for number in range(1, pages + 1):
+            response = client.get(entry, {'page': number} if number > 1 else {})
+            if response.status_code >= 400:
+                raise ValueError("%s?page=%d answered %d" % (entry, number, response.status_code))
+        return
+    if settings.COUNT_CACHE is None:
+        raise ImproperlyConfigured("Warming up querysets requires PAGINATION_COUNT_CACHE.")
+    paginator = get_paginator(get_paginator_class(), load_queryset(entry), per_page or settings.DEFAULT_PAGINATION,
+                              settings.DEFAULT_ORPHANS)
+    paginator.count
+
+
+def warm_up(entries=None, pages=1, concurrency=4, per_page=None, host=None):
+    """
+    Warms up each entry, ``PAGINATION_WARM_UP`` by default, with at most
+    concurrency of them at a time. See ``warm_up_entry``.
+
+    Returns an (entry, seconds, error) tuple for each entry, the error being
+    None unless warming it up failed.
+    """
+    if entries is None:
+        entries = settings.WARM_UP
+
+    def warm_up_one(entry):
+        started = default_timer()
+        try:
+            warm_up_entry(entry, pages, per_page, host)
+        except Exception as error:
+            return entry, default_timer() - started, error
+        return entry, default_timer() - started, None
+
+    entries = list(entries)
+    if ThreadPoolExecutor is None or concurrency < 2 or len(entries) < 2:
+        return [warm_up_one(entry) for entry in entries]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(_closing_connections(warm_up_one), entries))
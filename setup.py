@@ -54,11 +54,13 @@ setup(
         "Intended Audience :: Developers",
         "License :: OSI Approved :: BSD License",
         "Operating System :: OS Independent",
-        "Programming Language :: Python :: 2.6",
         "Programming Language :: Python :: 2.7",
         "Programming Language :: Python :: 3",
         "Programming Language :: Python :: 3.3",
     ],
+    install_requires=[
+        'Django >= 1.8'
+    ],
     setup_requires=[
         'versiontools >= 1.3.1'
     ],